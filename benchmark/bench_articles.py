@@ -0,0 +1,131 @@
+"""
+Benchmark the article generation against the local stand-in model and a local redis server.
+
+Send `--requests` article requests picking among `--word-sets` distinct word sets, and compare the
+legacy flow, where every request blocks a worker thread on its own model call, with the
+`ArticleGenerator`, which awaits the shared model calls on the event loop. Report the throughput, the
+number of model calls, and the worker occupancy: the share of the worker time spent blocked on the model.
+Then serve the requests from an `ArticlePool` refilled in the background, and report its metrics.
+
+Usage:
+    REDIS_HOST=localhost REDIS_PORT=6379 python benchmark/bench_articles.py --requests 500 --latency 0.5
+"""
+import os
+import sys
+import time
+import random
+import asyncio
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from django.conf import settings  # noqa: E402
+
+settings.configure(
+    ARTICLE_MODEL="stub", ARTICLE_CONCURRENCY=4, ARTICLE_FOREGROUND_CONCURRENCY=4, ARTICLE_POOL_SIZE=5)
+
+from gaming.articles import (  # noqa: E402
+    ArticleGenerator, ArticlePool, StubArticleModel, POOL_LEVELS_KEY, POOL_METRICS_KEY,
+)
+from gaming.redis_client import r  # noqa: E402
+
+# a level out of the corpus, so the benchmark doesn't touch the real pools
+LEVEL = 999
+
+
+def report(name, requests, elapsed, calls, occupancy):
+    print(
+        f"{name:>8}: {requests / elapsed:10.1f} requests/sec, {elapsed * 1000:10.1f} ms total, "
+        f"model calls: {calls}, worker occupancy: {occupancy * 100:5.1f}%"
+    )
+
+
+def run_legacy(word_sets, latency, workers):
+    def handle(words):
+        # the worker is blocked for the whole model call
+        time.sleep(latency)
+        return " ".join(words)
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        list(pool.map(handle, word_sets))
+    elapsed = time.perf_counter() - start
+
+    report("legacy", len(word_sets), elapsed, len(word_sets), len(word_sets) * latency / (workers * elapsed))
+
+
+def run_generator(word_sets, latency, concurrency):
+    model = StubArticleModel(latency=latency)
+    generator = ArticleGenerator(model, max_concurrency=concurrency)
+    r.delete(*{generator.cache_key(LEVEL, words) for words in word_sets})
+
+    async def handle_all():
+        return await asyncio.gather(*[generator.generate(LEVEL, words) for words in word_sets])
+
+    start = time.perf_counter()
+    asyncio.run(handle_all())
+    elapsed = time.perf_counter() - start
+
+    # the requests only await the model, so no worker is blocked
+    report("async", len(word_sets), elapsed, model.calls, 0.0)
+    print(f"{'':>8}  at most {model.max_inflight} model calls in flight")
+
+    r.delete(*{generator.cache_key(LEVEL, words) for words in word_sets})
+
+
+def run_pool(requests, latency, concurrency, size, word_sets):
+    sets = iter(word_sets)
+
+    async def pick_words(level):
+        return next(sets)
+
+    pool = ArticlePool(ArticleGenerator(StubArticleModel(latency=latency), max_concurrency=concurrency),
+                       size=size, pick_words=pick_words)
+    r.delete(pool.pool_key(LEVEL))
+
+    async def handle_all():
+        await pool.refill(LEVEL)
+
+        latencies = []
+        for _ in range(requests):
+            start = time.perf_counter()
+            await pool.take(LEVEL)
+            latencies.append(time.perf_counter() - start)
+
+            # the requests arrive at half of the generation throughput
+            await asyncio.sleep(2 * latency / concurrency)
+
+        return sorted(latencies), await pool.get_metrics()
+
+    latencies, metrics = asyncio.run(handle_all())
+    print(f"{'pool':>8}: p50 {latencies[len(latencies) // 2] * 1000:.2f} ms, "
+          f"p99 {latencies[int(len(latencies) * 0.99)] * 1000:.2f} ms, metrics {metrics.get(str(LEVEL))}")
+
+    r.delete(pool.pool_key(LEVEL))
+    r.srem(POOL_LEVELS_KEY, LEVEL)
+    r.hdel(POOL_METRICS_KEY, *[f"{LEVEL}_{name}" for name in ("hits", "misses", "refills", "refill_seconds")])
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=500)
+    parser.add_argument("--word-sets", type=int, default=50)
+    parser.add_argument("--latency", type=float, default=0.5)
+    parser.add_argument("--workers", type=int, default=16)
+    parser.add_argument("--concurrency", type=int, default=4)
+    args = parser.parse_args()
+
+    sets = [[f"word_{i}_{j}" for j in range(10)] for i in range(args.word_sets)]
+    word_sets = [random.choice(sets) for _ in range(args.requests)]
+
+    run_legacy(word_sets, args.latency, args.workers)
+    run_generator(word_sets, args.latency, args.concurrency)
+
+    # every article of the pool is made of distinct words
+    distinct_sets = ([f"pool_word_{i}_{j}" for j in range(10)] for i in range(sys.maxsize))
+    run_pool(args.requests // 5, args.latency, args.concurrency, 5, distinct_sets)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,136 @@
+"""
+Benchmark cross-process `group_send` of `answer` events on the redis channel layer.
+
+Spawn `--workers` receiver processes and `--workers` sender processes sharing the channel layer
+configured by `CHANNEL_LAYER_HOSTS`. Each receiver joins two channels to its share of the rooms, like
+the two players of a battle, and each sender broadcasts `answer` events to rooms owned by another
+process. The delivery latency of every event is collected and compared to `--target-ms`.
+
+Usage:
+    CHANNEL_LAYER_HOSTS=redis://localhost:6379,redis://localhost:6380 \
+        python benchmark/bench_channel_layer.py --workers 4 --rooms 200 --rounds 20
+"""
+import os
+import time
+import asyncio
+import argparse
+import statistics
+import multiprocessing
+
+from channels_redis.core import RedisChannelLayer
+
+
+def get_layer():
+    hosts = os.environ.get("CHANNEL_LAYER_HOSTS", "redis://localhost:6379")
+    return RedisChannelLayer(
+        hosts=[host.strip() for host in hosts.split(",") if host.strip()],
+        prefix="bench",
+        capacity=1500,
+        expiry=10,
+    )
+
+
+def room_name(i):
+    return f"room_bench_{i}"
+
+
+async def receive_rooms(rooms, expected, ready, results):
+    layer = get_layer()
+
+    channels = []
+    for room in rooms:
+        # the host and the guest of the room
+        for _ in range(2):
+            channel = await layer.new_channel()
+            await layer.group_add(room, channel)
+            channels.append(channel)
+
+    ready.wait()
+
+    latencies = []
+
+    async def drain(channel):
+        for _ in range(expected):
+            event = await layer.receive(channel)
+            latencies.append(time.time() - event["sent"])
+
+    await asyncio.gather(*[drain(channel) for channel in channels])
+    await layer.flush()
+
+    results.put(latencies)
+
+
+async def send_rooms(rooms, rounds, ready):
+    layer = get_layer()
+    ready.wait()
+
+    for _ in range(rounds):
+        await asyncio.gather(*[
+            layer.group_send(room, {
+                "type": "answer",
+                "answered_user": "bench",
+                "option_index": 1,
+                "added_score": 100,
+                "sent": time.time(),
+            })
+            for room in rooms
+        ])
+
+
+def receiver(rooms, rounds, ready, results):
+    asyncio.run(receive_rooms(rooms, rounds, ready, results))
+
+
+def sender(rooms, rounds, ready):
+    asyncio.run(send_rooms(rooms, rounds, ready))
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--rooms", type=int, default=200)
+    parser.add_argument("--rounds", type=int, default=20)
+    parser.add_argument("--target-ms", type=float, default=20.0)
+    args = parser.parse_args()
+
+    ready = multiprocessing.Barrier(args.workers * 2)
+    results = multiprocessing.Queue()
+
+    shares = [
+        [room_name(i) for i in range(w, args.rooms, args.workers)]
+        for w in range(args.workers)
+    ]
+
+    processes = []
+    for w, rooms in enumerate(shares):
+        processes.append(multiprocessing.Process(
+            target=receiver, args=(rooms, args.rounds, ready, results)))
+        # send to the rooms received by the next process
+        processes.append(multiprocessing.Process(
+            target=sender, args=(shares[(w + 1) % args.workers], args.rounds, ready)))
+
+    start = time.perf_counter()
+    for process in processes:
+        process.start()
+
+    latencies = []
+    for _ in range(args.workers):
+        latencies.extend(results.get())
+
+    for process in processes:
+        process.join()
+    elapsed = time.perf_counter() - start
+
+    latencies = sorted(latency * 1000 for latency in latencies)
+    p50 = statistics.median(latencies)
+    p99 = latencies[int(len(latencies) * 0.99) - 1]
+
+    print(
+        f"{len(latencies)} events in {elapsed:6.2f} s, "
+        f"p50 {p50:6.2f} ms, p99 {p99:6.2f} ms, max {latencies[-1]:6.2f} ms"
+    )
+    print("PASS" if p99 <= args.target_ms else "FAIL", f"(target p99 {args.target_ms} ms)")
+
+
+if __name__ == "__main__":
+    main()
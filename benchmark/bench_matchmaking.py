@@ -0,0 +1,178 @@
+"""
+Benchmark the matchmaking of the game consumer against a local redis server.
+
+Simulate a burst of concurrent connects on one challenge key and compare the legacy
+`lpop` + skip-loop + `rpush`/`set` flow with the `MatchMaker` lua script. Every joining player
+reports the room it ended in, so we could also count the double matched and the stranded hosts.
+
+Then fill a waiting queue with `--waiting` hosts of normally distributed ratings, a share of them
+cancelled, and send `--joins` players through the rating-based `MatchMaker.join`. Report the join
+latency and the rating gap of the matched pairs for growing queue sizes, and the gap of the pairs
+matched in arrival order like the FIFO waiting lists for comparison.
+
+Usage:
+    REDIS_HOST=localhost REDIS_PORT=6379 python benchmark/bench_matchmaking.py --players 1000 --waiting 10000
+"""
+import os
+import sys
+import time
+import random
+import argparse
+from collections import Counter
+from statistics import mean
+from concurrent.futures import ThreadPoolExecutor
+
+import redis
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from gaming.algo import INITIAL_RATING, rating_window  # noqa: E402
+from gaming.matchmaking import MatchMaker, GUEST, WAITING_QUEUES_KEY  # noqa: E402
+
+WAITING_KEY = "bench_0_waiting"
+QUEUE_KEY = "bench_0_queue"
+RATING_SPREAD = 300
+
+
+def legacy_join(r: redis.Redis, username: str):
+    waitingRoom = r.lpop(WAITING_KEY)
+
+    while waitingRoom is not None and r.get(waitingRoom):
+        r.delete(waitingRoom)
+        waitingRoom = r.lpop(WAITING_KEY)
+
+    if waitingRoom is None:
+        roomName = MatchMaker.room_name(username, WAITING_KEY)
+        r.rpush(WAITING_KEY, roomName)
+        r.set(MatchMaker.host_key(roomName), username)
+        return roomName
+
+    r.get(MatchMaker.host_key(waitingRoom))
+    r.delete(MatchMaker.host_key(waitingRoom))
+    return waitingRoom
+
+
+def engine_join(matchMaker: MatchMaker, username: str):
+    # any rating is matched, like the legacy flow
+    role, roomName, _ = matchMaker.join(QUEUE_KEY, username, INITIAL_RATING)
+    return roomName
+
+
+def run(name, join, r: redis.Redis, players: int, workers: int):
+    r.delete(WAITING_KEY, QUEUE_KEY)
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        rooms = list(pool.map(lambda i: join(f"player_{i}"), range(players)))
+    elapsed = time.perf_counter() - start
+
+    occupancy = Counter(rooms)
+    overbooked = sum(1 for v in occupancy.values() if v > 2)
+    stranded = r.llen(WAITING_KEY) + r.zcard(QUEUE_KEY)
+
+    print(
+        f"{name:>8}: {players / elapsed:10.1f} joins/sec, "
+        f"{elapsed * 1000:8.1f} ms total, overbooked rooms: {overbooked}, left waiting: {stranded}"
+    )
+
+    r.delete(WAITING_KEY, QUEUE_KEY)
+    r.srem(WAITING_QUEUES_KEY, QUEUE_KEY)
+
+
+def random_rating():
+    return random.gauss(INITIAL_RATING, RATING_SPREAD)
+
+
+def fill_queue(r: redis.Redis, matchMaker: MatchMaker, waiting: int, dead_share: float):
+    """
+    Register the waiting hosts directly, so they are not matched with each other while filling.
+    """
+    ratings = {}
+    pipe = r.pipeline(transaction=False)
+    for i in range(waiting):
+        username = f"waiting_{i}"
+        room = matchMaker.room_name(username, QUEUE_KEY)
+        ratings[username] = rating = random_rating()
+
+        pipe.zadd(QUEUE_KEY, {room: rating})
+        if random.random() < dead_share:
+            # a cancelled room, which the joins skip and drop
+            pipe.set(room, 1, ex=matchMaker.host_ttl)
+        else:
+            pipe.set(matchMaker.host_key(room), username, ex=matchMaker.host_ttl)
+
+        if len(pipe) >= 1000:
+            pipe.execute()
+    pipe.execute()
+
+    return ratings
+
+
+def run_rated(r: redis.Redis, matchMaker: MatchMaker, waiting: int, joins: int, dead_share: float):
+    r.delete(QUEUE_KEY)
+    ratings = fill_queue(r, matchMaker, waiting, dead_share)
+
+    latencies = []
+    gaps = []
+    for i in range(joins):
+        username = f"joining_{i}"
+        ratings[username] = rating = random_rating()
+
+        start = time.perf_counter()
+        role, _, host = matchMaker.join(QUEUE_KEY, username, rating, rating_window(0))
+        latencies.append(time.perf_counter() - start)
+
+        if role == GUEST:
+            gaps.append(abs(ratings[host] - rating))
+
+    rooms = [matchMaker.room_name(username, QUEUE_KEY) for username in ratings]
+    for i in range(0, len(rooms), 1000):
+        batch = rooms[i:i + 1000]
+        r.delete(*batch, *[matchMaker.host_key(room) for room in batch])
+    r.delete(QUEUE_KEY)
+    r.srem(WAITING_QUEUES_KEY, QUEUE_KEY)
+
+    latencies.sort()
+    print(
+        f"{waiting:>8} waiting: p50 {latencies[len(latencies) // 2] * 1e6:8.1f} us, "
+        f"p99 {latencies[int(len(latencies) * 0.99)] * 1e6:8.1f} us, "
+        f"matched {len(gaps) / joins * 100:5.1f}%, mean rating gap {mean(gaps) if gaps else 0:6.1f}"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--players", type=int, default=1000)
+    parser.add_argument("--workers", type=int, default=64)
+    parser.add_argument("--waiting", type=int, default=10000)
+    parser.add_argument("--joins", type=int, default=2000)
+    parser.add_argument("--dead-share", type=float, default=0.1)
+    args = parser.parse_args()
+
+    r = redis.StrictRedis(
+        host=os.environ.get("REDIS_HOST", "localhost"),
+        port=os.environ.get("REDIS_PORT", 6379),
+        decode_responses=True,
+        username=os.environ.get("REDIS_USERNAME"),
+        password=os.environ.get("REDIS_PASSWORD"),
+        max_connections=args.workers * 2,
+    )
+    matchMaker = MatchMaker(r)
+
+    run("legacy", lambda u: legacy_join(r, u), r,
+        args.players, args.workers)
+    run("engine", lambda u: engine_join(matchMaker, u), r,
+        args.players, args.workers)
+
+    waiting = 100
+    while waiting < args.waiting:
+        run_rated(r, matchMaker, waiting, args.joins, args.dead_share)
+        waiting *= 10
+    run_rated(r, matchMaker, args.waiting, args.joins, args.dead_share)
+
+    fifo_gaps = [abs(random_rating() - random_rating()) for _ in range(args.joins)]
+    print(f"{'fifo':>16}: mean rating gap {mean(fifo_gaps):6.1f}")
+
+
+if __name__ == "__main__":
+    main()
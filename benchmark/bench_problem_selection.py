@@ -0,0 +1,90 @@
+"""
+Benchmark the difficulty-aware selection of the battle problems on a synthetic pool.
+
+Compare drawing a battle set around a target difficulty from the `ProblemBuckets` with filtering the
+whole pool by difficulty on every draw, and with the uniform draw. Also report the cost of building and
+refreshing the buckets, and how far the drawn problems are from the target difficulty.
+
+Usage:
+    python benchmark/bench_problem_selection.py --problems 100000 --draws 10000
+"""
+import os
+import sys
+import time
+import random
+import argparse
+from statistics import mean
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from gaming.algo import ProblemBuckets, problem_difficulty  # noqa: E402
+
+MAX_WORD_LEVEL = 16
+
+
+def synthetic_pool(size):
+    entries = []
+    rates = {}
+    for i in range(size):
+        hashed_id = f"problem_{i}"
+        entries.append((hashed_id, f"problem {i}", ["a", "b", "c", "d"], "a"))
+        rates[hashed_id] = (random.uniform(0, 100), random.randint(1, MAX_WORD_LEVEL))
+
+    return entries, rates
+
+
+def build(entries, rates):
+    difficulties = [problem_difficulty(*rates[entry[0]], MAX_WORD_LEVEL) for entry in entries]
+    return ProblemBuckets(entries, difficulties, key=lambda entry: entry[0])
+
+
+def filter_draw(entries, difficulties, k, difficulty, width=0.1):
+    candidates = [entry for entry, d in zip(entries, difficulties) if abs(d - difficulty) <= width]
+    return random.sample(candidates, min(k, len(candidates)))
+
+
+def timed(name, draw, draws):
+    start = time.perf_counter()
+    for _ in range(draws):
+        draw()
+    elapsed = time.perf_counter() - start
+
+    print(f"{name:>8}: {draws / elapsed:12.1f} draws/sec, {elapsed / draws * 1e6:10.1f} us/draw")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--problems", type=int, default=100000)
+    parser.add_argument("--draws", type=int, default=10000)
+    parser.add_argument("--k", type=int, default=5)
+    args = parser.parse_args()
+
+    entries, rates = synthetic_pool(args.problems)
+    difficulty_of = {entry[0]: problem_difficulty(*rates[entry[0]], MAX_WORD_LEVEL) for entry in entries}
+    difficulties = [difficulty_of[entry[0]] for entry in entries]
+
+    start = time.perf_counter()
+    buckets = build(entries, rates)
+    print(f"   build: {(time.perf_counter() - start) * 1000:10.1f} ms for {args.problems} problems, "
+          f"bucket sizes {[len(bucket) for bucket in buckets.buckets]}")
+
+    targets = [random.random() for _ in range(args.draws)]
+    sets = iter(targets)
+
+    timed("uniform", lambda: buckets.sample(args.k), args.draws)
+    timed("buckets", lambda: buckets.sample(args.k, next(sets)), args.draws)
+
+    # the filtering draw scans the whole pool, so fewer draws are enough to measure it
+    filter_draws = max(args.draws // 100, 1)
+    sets = iter(targets)
+    timed("filter", lambda: filter_draw(entries, difficulties, args.k, next(sets)), filter_draws)
+
+    errors = [
+        mean(abs(difficulty_of[entry[0]] - target) for entry in buckets.sample(args.k, target))
+        for target in targets
+    ]
+    print(f"   error: {mean(errors):10.3f} mean distance from the target difficulty")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,110 @@
+"""
+Benchmark the wire protocols of the battle sockets on the frames of a battle.
+
+Encode and decode `--frames` frames of each type with the JSON and msgpack codecs, with the full
+problems and with the problems referenced by `hashed_id`, and report the bytes per frame and the
+encode/decode CPU time. The problems are taken from `gaming/problems.json`.
+
+Usage:
+    python benchmark/bench_protocol.py --frames 10000
+"""
+import os
+import sys
+import time
+import random
+import argparse
+from itertools import islice
+
+import msgpack
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from gaming.algo import hash_problem  # noqa: E402
+from gaming.corpus import iter_problems  # noqa: E402
+from gaming.protocol import JSONCodec, MsgpackCodec, ANSWER  # noqa: E402
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PROBLEMS_PATH = os.path.join(BASE_DIR, "gaming", "problems.json")
+
+
+def battle_frames():
+    problems = []
+    for _, problem in islice(iter_problems(PROBLEMS_PATH), 5):
+        order = random.sample(range(len(problem["options"])), len(problem["options"]))
+        options = [problem["options"][i] for i in order]
+        problems.append({
+            "problem_id": hash_problem(problem),
+            "problem": problem["problem"],
+            "options": options,
+            "answer": order.index(problem["answer"]),
+            "order": order,
+        })
+
+    start_game = {
+        "type": "start_game",
+        "problems": problems,
+        "usernames": ["player_one", "player_two"],
+        "names": ["Player One", "Player Two"],
+        "round_seconds": 20,
+    }
+    round_result = {
+        "type": "round_result",
+        "round": 2,
+        "finished": False,
+        "next_deadline": time.time() + 20,
+        "results": [
+            {"username": "player_one", "option_index": 2, "correct": True, "added_score": 180,
+             "score": 530},
+            {"username": "player_two", "option_index": None, "correct": False, "added_score": 0,
+             "score": 370},
+        ],
+    }
+
+    return {"start_game": start_game, "round_result": round_result}
+
+
+def bench(name, codec, frames, count):
+    for frame_type, message in frames.items():
+        start = time.perf_counter()
+        for _ in range(count):
+            encoded = codec.encode(message)
+        encode_time = time.perf_counter() - start
+
+        data = encoded.get("text_data") or encoded.get("bytes_data")
+        size = len(data.encode() if isinstance(data, str) else data)
+
+        print(f"{name:>12} {frame_type:>12}: {size:6d} bytes/frame, encode {encode_time * 1000:8.1f} ms")
+
+    # the answers are the only frames decoded by the server
+    if isinstance(codec, MsgpackCodec):
+        answer = {"bytes_data": msgpack.packb([ANSWER, 2, 1])}
+    else:
+        answer = codec.encode({"type": "answer", "optionIndex": 2, "round": 1})
+
+    start = time.perf_counter()
+    for _ in range(count):
+        codec.decode(**answer)
+    decode_time = time.perf_counter() - start
+
+    data = answer.get("text_data") or answer.get("bytes_data")
+    size = len(data.encode() if isinstance(data, str) else data)
+    print(f"{name:>12} {'answer':>12}: {size:6d} bytes/frame, decode {decode_time * 1000:8.1f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--frames", type=int, default=10000)
+    args = parser.parse_args()
+
+    frames = battle_frames()
+    for name, codec in [
+        ("json", JSONCodec()),
+        ("json+ref", JSONCodec(refs=True)),
+        ("msgpack", MsgpackCodec()),
+        ("msgpack+ref", MsgpackCodec(refs=True)),
+    ]:
+        bench(name, codec, frames, args.frames)
+
+
+if __name__ == "__main__":
+    main()
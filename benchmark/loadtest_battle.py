@@ -0,0 +1,78 @@
+"""
+Load test the battle sockets of a running daphne server.
+
+Open `--players` concurrent sockets on both the sync (`battle`) and the async (`battle_async`)
+game consumer, wait until every player is either waiting or has received `start_game`, and report
+the connect latency percentiles and the number of started games for each implementation.
+
+Usage:
+    daphne -p 8000 testing_game.asgi:application
+    python benchmark/loadtest_battle.py --url ws://localhost:8000/ws --players 2000
+"""
+import time
+import json
+import asyncio
+import argparse
+import statistics
+
+import websockets
+
+
+async def play(url, route, challenge, i, latencies, started, timeout):
+    uri = f"{url}/{route}?user=load_{route}_{i}&challenge={challenge}&level=0"
+    start = time.perf_counter()
+
+    async with websockets.connect(uri, open_timeout=timeout) as websocket:
+        message = json.loads(await asyncio.wait_for(websocket.recv(), timeout))
+        latencies.append(time.perf_counter() - start)
+
+        # the host waits for its guest to start the game
+        if message["type"] == "wait":
+            message = json.loads(await asyncio.wait_for(websocket.recv(), timeout))
+
+        if message["type"] == "start_game":
+            started.append(i)
+
+
+async def run(url, route, players, challenge, timeout):
+    latencies = []
+    started = []
+
+    start = time.perf_counter()
+    results = await asyncio.gather(
+        *[play(url, route, challenge, i, latencies, started, timeout) for i in range(players)],
+        return_exceptions=True,
+    )
+    elapsed = time.perf_counter() - start
+
+    errors = sum(1 for result in results if isinstance(result, Exception))
+    latencies.sort()
+
+    if latencies:
+        p50 = statistics.median(latencies) * 1000
+        p99 = latencies[int(len(latencies) * 0.99) - 1] * 1000
+    else:
+        p50 = p99 = float("nan")
+
+    print(
+        f"{route:>13}: {players} sockets in {elapsed:6.2f} s, "
+        f"p50 {p50:8.1f} ms, p99 {p99:8.1f} ms, "
+        f"started {len(started)}, errors {errors}"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--url", default="ws://localhost:8000/ws")
+    parser.add_argument("--players", type=int, default=1000)
+    parser.add_argument("--challenge", default="gre")
+    parser.add_argument("--timeout", type=float, default=30.0)
+    parser.add_argument("--routes", nargs="+", default=["battle", "battle_async"])
+    args = parser.parse_args()
+
+    for route in args.routes:
+        asyncio.run(run(args.url, route, args.players, args.challenge, args.timeout))
+
+
+if __name__ == "__main__":
+    main()
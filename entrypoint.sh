@@ -9,5 +9,11 @@ python3 manage.py makemigrations gaming --noinput
 echo "migrating..."
 python3 manage.py migrate --noinput
 
+echo "starting the problem stats flusher..."
+python3 manage.py flush_problem_stats &
+
+echo "starting the hesitation flusher..."
+python3 manage.py flush_hesitations &
+
 echo "deploying..."
 daphne -b 0.0.0.0 -p 8000 testing_game.asgi:application
\ No newline at end of file
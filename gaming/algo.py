@@ -1,5 +1,6 @@
 import hashlib
 import json
+import random
 
 def hash_problem(problem: dict):
     problem_dict = {
@@ -8,4 +9,141 @@ def hash_problem(problem: dict):
     }
 
     problem_json = json.dumps(problem_dict, sort_keys=True).encode('utf-8')
-    return hashlib.sha256(problem_json).hexdigest()
\ No newline at end of file
+    return hashlib.sha256(problem_json).hexdigest()
+
+
+DIFFICULTY_BUCKETS = 5
+
+
+def problem_difficulty(correct_rate: float, word_level: int = None, max_word_level: int = None) -> float:
+    """
+    Score the difficulty of a problem in [0, 1] from its correct rate, averaged with the relative level
+    of its word if any.
+    """
+    difficulty = 1 - min(max(correct_rate, 0.0), 100.0) / 100
+
+    if word_level is not None and max_word_level:
+        difficulty = (difficulty + min(word_level / max_word_level, 1.0)) / 2
+
+    return difficulty
+
+
+class ProblemBuckets:
+    """
+    Problems bucketed by difficulty, to draw a problem set around a target difficulty in O(k).
+
+    A draw takes most of the problems from the bucket of the target difficulty and one problem out of
+    four from each neighbour bucket, so both players get a few easier and harder problems. The buckets
+    running out of problems are backfilled from the nearest buckets.
+    """
+
+    def __init__(self, problems, difficulties, key=lambda problem: problem, bucket_count=DIFFICULTY_BUCKETS):
+        self.problems = list(problems)
+        self.key = key
+        self.buckets = [[] for _ in range(bucket_count)]
+
+        for problem, difficulty in zip(self.problems, difficulties):
+            self.buckets[self.bucket_of(difficulty)].append(problem)
+
+    def __len__(self):
+        return len(self.problems)
+
+    def bucket_of(self, difficulty: float) -> int:
+        return min(max(int(difficulty * len(self.buckets)), 0), len(self.buckets) - 1)
+
+    def sample(self, k: int, difficulty: float = None):
+        """
+        Draw k distinct problems around the target difficulty, or uniformly if the difficulty is None.
+        """
+        k = min(k, len(self.problems))
+        if difficulty is None:
+            return random.sample(self.problems, k)
+
+        target = self.bucket_of(difficulty)
+        side = k // 4
+        quotas = {target: k - 2 * side}
+        for bucket in (target - 1, target + 1):
+            if 0 <= bucket < len(self.buckets):
+                quotas[bucket] = side
+            else:
+                quotas[target] += side
+
+        picked = {}
+        for bucket, quota in quotas.items():
+            self._take(bucket, quota, picked)
+
+        # backfill from the nearest buckets
+        for distance in range(len(self.buckets)):
+            for bucket in {target - distance, target + distance}:
+                if len(picked) < k and 0 <= bucket < len(self.buckets):
+                    self._take(bucket, k - len(picked), picked)
+
+        problems = list(picked.values())
+        random.shuffle(problems)
+        return problems
+
+    def _take(self, bucket, count, picked):
+        problems = self.buckets[bucket]
+        # oversample by the problems already picked, which are skipped
+        for problem in random.sample(problems, min(len(problems), count + len(picked))):
+            if count == 0:
+                break
+            if self.key(problem) not in picked:
+                picked[self.key(problem)] = problem
+                count -= 1
+
+
+MIN_EASE_FACTOR = 1.3
+
+
+def sm2(repetitions: int, interval: int, ease_factor: float, quality: int):
+    """
+    Schedule the next review with SuperMemo 2 from the quality of the answer, between 0 and 5.
+    Return the new `(repetitions, interval, ease_factor)`, where the interval is in days.
+    """
+    if quality < 3:
+        # start over, the ease factor is kept
+        return 0, 1, ease_factor
+
+    if repetitions == 0:
+        interval = 1
+    elif repetitions == 1:
+        interval = 6
+    else:
+        interval = round(interval * ease_factor)
+
+    ease_factor += 0.1 - (5 - quality) * (0.08 + (5 - quality) * 0.02)
+
+    return repetitions + 1, interval, max(ease_factor, MIN_EASE_FACTOR)
+
+
+INITIAL_RATING = 1500.0
+# the ratings of the new players move faster, until their rating is settled by `PROVISIONAL_BATTLES` battles
+ELO_K = 24
+PROVISIONAL_ELO_K = 48
+PROVISIONAL_BATTLES = 20
+
+
+def elo_k(battle_count: int):
+    return PROVISIONAL_ELO_K if battle_count < PROVISIONAL_BATTLES else ELO_K
+
+
+def elo(winner_rating: float, loser_rating: float, winner_k=ELO_K, loser_k=ELO_K):
+    """
+    Update the Elo ratings of the players of a battle from its result.
+    Return the new `(winner_rating, loser_rating)`.
+    """
+    expected = 1 / (1 + 10 ** ((loser_rating - winner_rating) / 400))
+    return winner_rating + winner_k * (1 - expected), loser_rating - loser_k * (1 - expected)
+
+
+# the rating difference accepted by the matchmaking, widened by the time the host has waited
+BASE_RATING_WINDOW = 100
+RATING_WINDOW_GROWTH = 10
+
+
+def rating_window(waited: float):
+    """
+    The rating difference accepted for a player who has waited for `waited` seconds.
+    """
+    return BASE_RATING_WINDOW + RATING_WINDOW_GROWTH * max(waited, 0)
@@ -0,0 +1,313 @@
+import asyncio
+import hashlib
+import logging
+import os
+import time
+import weakref
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+
+from .redis_client import new_async_client
+
+logger = logging.getLogger(__name__)
+
+ARTICLE_PREFIX = "article"
+ARTICLE_TTL = 60 * 60 * 24 * 7
+ARTICLE_WORD_COUNT = 10
+
+POOL_PREFIX = "article_pool"
+POOL_LEVELS_KEY = "article_pool_levels"
+POOL_METRICS_KEY = "article_pool_metrics"
+POOL_REFILL_LOCK_TTL = 60
+
+PROMPT = """
+make me a article with 300 words that must include the following words: {words}.
+The article doesn't have to be great, but must include the the words mentioned.
+The response should be in plain text format that only contain the article without any other words, and the included words in the article should be marked with @word&
+"""
+
+
+class GeminiArticleModel:
+    """
+    Generate the articles with Gemini, without blocking the event loop.
+    """
+
+    def __init__(self, model_name="gemini-2.0-flash-exp"):
+        import google.generativeai as genai
+
+        genai.configure(api_key=os.environ["GEMINI_API_KEY"])
+        self.model = genai.GenerativeModel(
+            model_name=model_name,
+            generation_config={
+                "temperature": 0.8,
+                "top_p": 0.95,
+                "top_k": 40,
+                "max_output_tokens": 8192,
+                "response_mime_type": "text/plain",
+            },
+        )
+
+    async def generate(self, prompt: str) -> str:
+        response = await self.model.generate_content_async(prompt)
+        return response.text
+
+
+class StubArticleModel:
+    """
+    Local stand-in of the model for the tests and the benchmarks, which answers after a fixed latency
+    with an article made of the marked words.
+    """
+
+    def __init__(self, latency=0.0):
+        self.latency = latency
+        self.calls = 0
+        self.inflight = 0
+        self.max_inflight = 0
+
+    async def generate(self, prompt: str) -> str:
+        self.calls += 1
+        self.inflight += 1
+        self.max_inflight = max(self.max_inflight, self.inflight)
+        try:
+            await asyncio.sleep(self.latency)
+        finally:
+            self.inflight -= 1
+
+        words = prompt.split("following words: ", 1)[1].split(".\n", 1)[0].split(", ")
+        return " ".join(f"@{word}&" for word in words)
+
+
+def get_article_model():
+    if settings.ARTICLE_MODEL == "stub":
+        return StubArticleModel()
+
+    return GeminiArticleModel()
+
+
+class ArticleGenerator:
+    """
+    Generate the articles of the word sets, shared by every request asking for the same set.
+
+    The articles are cached in redis under `(level, word set)`. On a cache miss, the concurrent requests
+    for the same set in the process wait for a single model call, and at most `max_concurrency` model calls
+    are in flight per process, the others waiting for a slot without occupying a worker.
+
+    The generations a user is waiting for (`foreground=True`) have their own `foreground_concurrency` slots,
+    so they don't queue behind the background refills of the article pools.
+    """
+
+    def __init__(self, model=None, max_concurrency=None, foreground_concurrency=None, ttl=ARTICLE_TTL):
+        # the model is created on the first generation, so importing the views doesn't need the api key
+        self.model = model
+        self.max_concurrency = max_concurrency or settings.ARTICLE_CONCURRENCY
+        self.foreground_concurrency = foreground_concurrency or settings.ARTICLE_FOREGROUND_CONCURRENCY
+        self.ttl = ttl
+        # the redis connections and the asyncio primitives are bound to the event loop they are used in
+        self._loops = weakref.WeakKeyDictionary()
+
+    @staticmethod
+    def cache_key(level, words):
+        digest = hashlib.sha1("\n".join(sorted(words)).encode("utf-8")).hexdigest()
+        return f"{ARTICLE_PREFIX}_{level}_{digest}"
+
+    async def generate(self, level, words, foreground=False) -> str:
+        key = self.cache_key(level, words)
+        client, semaphores, inflight = self._loop_state()
+        semaphore = semaphores[foreground]
+
+        article = await client.get(key)
+        if article is not None:
+            return article
+
+        task = inflight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(self._generate(key, words, client, semaphore))
+            inflight[key] = task
+            task.add_done_callback(lambda _: inflight.pop(key, None))
+
+        # a cancelled request doesn't cancel the generation shared with the others
+        return await asyncio.shield(task)
+
+    async def _generate(self, key, words, client, semaphore):
+        if self.model is None:
+            self.model = get_article_model()
+
+        async with semaphore:
+            article = await self.model.generate(PROMPT.format(words=", ".join(sorted(words))))
+
+        await client.set(key, article, ex=self.ttl)
+        return article
+
+    def _loop_state(self):
+        loop = asyncio.get_running_loop()
+        state = self._loops.get(loop)
+        if state is None:
+            semaphores = {
+                False: asyncio.Semaphore(self.max_concurrency),
+                True: asyncio.Semaphore(self.foreground_concurrency),
+            }
+            state = self._loops[loop] = (new_async_client(), semaphores, {})
+        return state
+
+
+async def pick_article_words(level, k=ARTICLE_WORD_COUNT):
+    # imported here so the generators could run without the app registry, e.g. in the benchmarks
+    from .word_list import wordSampler
+
+    # the primary keys of the words are the words themselves
+    return await sync_to_async(wordSampler.sample)(level, k)
+
+
+class ArticlePool:
+    """
+    Pools of pre-generated articles per level, so an article is handed out without waiting for the model.
+
+    The pools are redis lists shared by every process: a request pops an article, and the level is refilled
+    up to `size` articles in the background. A refill lock per level keeps a single process refilling it.
+    The pool sizes, hits, misses and refill latencies are kept in redis, see `get_metrics`.
+    """
+
+    def __init__(self, generator, size=None, pick_words=pick_article_words):
+        self.generator = generator
+        self.size = size or settings.ARTICLE_POOL_SIZE
+        self.pick_words = pick_words
+        # the redis connections and the refill tasks are bound to the event loop they are used in
+        self._loops = weakref.WeakKeyDictionary()
+
+    @staticmethod
+    def pool_key(level):
+        return f"{POOL_PREFIX}_{level}"
+
+    async def take(self, level):
+        """
+        Pop a pre-generated article of the level, or None if the pool is empty, and refill the pool in the
+        background.
+        """
+        client, _ = self._loop_state()
+
+        pipe = client.pipeline(transaction=False)
+        pipe.lpop(self.pool_key(level))
+        pipe.sadd(POOL_LEVELS_KEY, level)
+        article, _ = await pipe.execute()
+
+        await client.hincrby(POOL_METRICS_KEY, f"{level}_{'hits' if article is not None else 'misses'}", 1)
+        self.schedule_refill(level)
+
+        return article
+
+    def schedule_refill(self, level):
+        """
+        Refill the pool of the level in a background task, unless it is already refilled by this process.
+        """
+        _, refills = self._loop_state()
+
+        if level not in refills:
+            task = asyncio.ensure_future(self.refill(level))
+            refills[level] = task
+            task.add_done_callback(lambda task: self._refilled(refills, level, task))
+
+    @staticmethod
+    def _refilled(refills, level, task):
+        refills.pop(level, None)
+
+        # retrieve the error of the background task, which nobody awaits
+        if not task.cancelled() and task.exception() is not None:
+            logger.error("failed to refill the article pool of level %s", level, exc_info=task.exception())
+
+    async def refill(self, level):
+        """
+        Generate articles of random words of the level until the pool is full.
+        Return the number of the generated articles, or None if another process is refilling the level.
+        """
+        client, _ = self._loop_state()
+        lock_key = f"{self.pool_key(level)}_refill_lock"
+
+        if not await client.set(lock_key, 1, nx=True, ex=POOL_REFILL_LOCK_TTL):
+            return None
+
+        try:
+            await client.sadd(POOL_LEVELS_KEY, level)
+
+            # the articles taken during the refill are refilled in the next round
+            generated = 0
+            while (missing := self.size - await client.llen(self.pool_key(level))) > 0:
+                refilled = sum(await asyncio.gather(
+                    *[self._refill_one(client, level) for _ in range(missing)]))
+                if refilled == 0:
+                    break
+
+                generated += refilled
+                await client.expire(lock_key, POOL_REFILL_LOCK_TTL)
+
+            return generated
+        finally:
+            await client.delete(lock_key)
+
+    async def _refill_one(self, client, level):
+        words = await self.pick_words(level)
+        if not words:
+            return 0
+
+        start = time.perf_counter()
+        article = await self.generator.generate(level, words)
+        elapsed = time.perf_counter() - start
+
+        pipe = client.pipeline(transaction=False)
+        pipe.rpush(self.pool_key(level), article)
+        pipe.hincrby(POOL_METRICS_KEY, f"{level}_refills", 1)
+        pipe.hincrbyfloat(POOL_METRICS_KEY, f"{level}_refill_seconds", elapsed)
+        await pipe.execute()
+
+        return 1
+
+    async def refill_forever(self, levels, interval):
+        """
+        Keep the pools of the levels full, checking them every `interval` seconds.
+        """
+        while True:
+            await asyncio.gather(*[self.refill(level) for level in levels])
+            await asyncio.sleep(interval)
+
+    async def get_metrics(self):
+        """
+        Get `{level: metrics}` of the pools, with the pool size, the hit rate and the refill latency.
+        """
+        client, _ = self._loop_state()
+
+        levels = sorted(await client.smembers(POOL_LEVELS_KEY), key=int)
+        counters = await client.hgetall(POOL_METRICS_KEY)
+
+        pipe = client.pipeline(transaction=False)
+        for level in levels:
+            pipe.llen(self.pool_key(level))
+        sizes = await pipe.execute()
+
+        metrics = {}
+        for level, size in zip(levels, sizes):
+            hits = int(counters.get(f"{level}_hits", 0))
+            misses = int(counters.get(f"{level}_misses", 0))
+            refills = int(counters.get(f"{level}_refills", 0))
+            refill_seconds = float(counters.get(f"{level}_refill_seconds", 0))
+
+            metrics[level] = {
+                "size": size,
+                "hits": hits,
+                "misses": misses,
+                "hitRate": hits / (hits + misses) if hits + misses else None,
+                "refills": refills,
+                "averageRefillSeconds": refill_seconds / refills if refills else None,
+            }
+
+        return metrics
+
+    def _loop_state(self):
+        loop = asyncio.get_running_loop()
+        state = self._loops.get(loop)
+        if state is None:
+            state = self._loops[loop] = (new_async_client(), {})
+        return state
+
+
+articleGenerator = ArticleGenerator()
+articlePool = ArticlePool(articleGenerator)
@@ -0,0 +1,261 @@
+import time
+
+import redis
+import redis.asyncio
+
+BATTLE_PREFIX = "battle"
+
+# the seconds given to answer a problem, and the score of an answer given right away
+ROUND_SECONDS = 20
+MAX_ROUND_SCORE = 200
+# the battle state is dropped if nobody answers for this long
+BATTLE_TTL = 10 * 60
+
+CLOSED = "closed"
+
+# KEYS[1]: the battle key of the room
+# ARGV[1]: "answer" to record an answer, or "timeout" to close the round at its deadline
+# ARGV[2]: the current time in seconds
+# ARGV[3]: the seconds of a round
+# ARGV[4]: the score of an answer given right away
+# ARGV[5]: the battle TTL
+# for "answer", ARGV[6..8]: the username, the round answered ("" for the current one) and the option index
+# ("" for no option); for "timeout", ARGV[6]: the round to close
+ROUND_SCRIPT = """
+local key = KEYS[1]
+local mode = ARGV[1]
+local now = tonumber(ARGV[2])
+local round_seconds = tonumber(ARGV[3])
+local max_score = tonumber(ARGV[4])
+local ttl = tonumber(ARGV[5])
+
+if redis.call('EXISTS', key) == 0 then
+    return {'missing'}
+end
+
+local state = redis.call('HMGET', key, 'round', 'deadline', 'answers', 'player:0', 'player:1')
+local round = tonumber(state[1])
+local deadline = tonumber(state[2])
+local players = {state[4], state[5]}
+
+local answers = {}
+for answer in string.gmatch(state[3], '[^,]+') do
+    table.insert(answers, tonumber(answer))
+end
+
+if round >= #answers then
+    return {'finished'}
+end
+
+if mode == 'answer' then
+    local username = ARGV[6]
+    if ARGV[7] ~= '' and tonumber(ARGV[7]) ~= round then
+        return {'stale'}
+    end
+    if username ~= players[1] and username ~= players[2] then
+        return {'unknown'}
+    end
+    -- a late answer is not recorded, it only closes the round
+    if now < deadline then
+        if redis.call('HSETNX', key, 'answer:' .. username, ARGV[8] .. '|' .. ARGV[2]) == 0 then
+            return {'duplicate'}
+        end
+        -- the round is closed once both players have answered
+        if redis.call('HINCRBY', key, 'answered', 1) < 2 then
+            return {'waiting'}
+        end
+    end
+else
+    if tonumber(ARGV[6]) ~= round then
+        return {'stale'}
+    end
+    if now < deadline then
+        return {'early'}
+    end
+end
+
+local result = {'closed', round, round + 1 >= #answers and 1 or 0}
+for _, player in ipairs(players) do
+    local option = ''
+    local answered_at = deadline
+    local answer = redis.call('HGET', key, 'answer:' .. player)
+    if answer then
+        local separator = string.find(answer, '|', 1, true)
+        option = string.sub(answer, 1, separator - 1)
+        answered_at = tonumber(string.sub(answer, separator + 1))
+    end
+
+    -- a correct answer scores from half to the full score, by the time left
+    local added = 0
+    local correct = option ~= '' and tonumber(option) == answers[round + 1]
+    if correct then
+        local left = math.max(0, math.min(deadline - answered_at, round_seconds))
+        added = math.floor(max_score / 2 + max_score / 2 * left / round_seconds)
+    end
+
+    local score = redis.call('HINCRBY', key, 'score:' .. player, added)
+    redis.call('HDEL', key, 'answer:' .. player)
+
+    table.insert(result, player)
+    table.insert(result, option)
+    table.insert(result, correct and 1 or 0)
+    table.insert(result, added)
+    table.insert(result, score)
+end
+
+redis.call('HSET', key, 'round', round + 1, 'answered', 0, 'deadline', now + round_seconds)
+redis.call('EXPIRE', key, ttl)
+return result
+"""
+
+
+class BattleState:
+    """
+    The server-authoritative state of the battles, shared by the consumers of both players.
+
+    The state of a room is a redis hash holding the current round and its deadline, the answer indices of
+    the problems sent by `startGame`, and the answers and cumulative scores of the two players. An answer
+    is recorded and scored against the problem set by a lua script, which closes the round atomically once
+    both players have answered or its deadline has passed, so exactly one consumer gets the round result
+    to broadcast.
+
+    ========================\n
+    ### Redis layout
+    - `battle_{roomName}`: hash of `round`, `deadline`, `answers` (comma separated answer indices),
+    `player:0`, `player:1`, `answered`, `answer:{username}` and `score:{username}`
+    """
+
+    def __init__(self, client: redis.Redis | redis.asyncio.Redis,
+                 round_seconds=ROUND_SECONDS, max_score=MAX_ROUND_SCORE):
+        self.client = client
+        self.round_seconds = round_seconds
+        self.max_score = max_score
+        self._round = client.register_script(ROUND_SCRIPT)
+
+    @staticmethod
+    def key(room_name: str) -> str:
+        return f"{BATTLE_PREFIX}_{room_name}"
+
+    def start(self, room_name: str, usernames, problems, now=None):
+        """
+        Start the first round of the battle on the problems sent by `startGame`.
+        Return the deadline of the first round.
+        """
+        mapping = self._start_mapping(usernames, problems, time.time() if now is None else now)
+
+        pipe = self.client.pipeline(transaction=True)
+        pipe.delete(self.key(room_name))
+        pipe.hset(self.key(room_name), mapping=mapping)
+        pipe.expire(self.key(room_name), BATTLE_TTL)
+        pipe.execute()
+
+        return mapping["deadline"]
+
+    def answer(self, room_name: str, username: str, option_index, round_index=None, now=None):
+        """
+        Record the answer of the player to the current round, or to `round_index` if specified.
+        Return the round result if the answer closes the round, otherwise None.
+        """
+        now = time.time() if now is None else now
+        result = self._round(**self._answer_params(room_name, username, option_index, round_index, now))
+        return self._parse(result, now)
+
+    def timeout(self, room_name: str, round_index: int, now=None):
+        """
+        Close the round if it is still open and its deadline has passed.
+        Return the round result if the round is closed by the call, otherwise None.
+        """
+        now = time.time() if now is None else now
+        return self._parse(self._round(**self._timeout_params(room_name, round_index, now)), now)
+
+    def _start_mapping(self, usernames, problems, now):
+        return {
+            "round": 0,
+            "deadline": now + self.round_seconds,
+            "answers": ",".join(str(problem["answer"]) for problem in problems),
+            "player:0": usernames[0],
+            "player:1": usernames[1],
+            "answered": 0,
+            **{f"score:{username}": 0 for username in usernames},
+        }
+
+    def _params(self, room_name, mode, now, *args):
+        return {
+            "keys": [self.key(room_name)],
+            "args": [
+                mode,
+                now,
+                self.round_seconds,
+                self.max_score,
+                BATTLE_TTL,
+                *args,
+            ],
+        }
+
+    def _answer_params(self, room_name, username, option_index, round_index, now):
+        return self._params(
+            room_name, "answer", now,
+            username,
+            "" if round_index is None else int(round_index),
+            "" if option_index is None else int(option_index),
+        )
+
+    def _timeout_params(self, room_name, round_index, now):
+        return self._params(room_name, "timeout", now, int(round_index))
+
+    def _parse(self, result, now):
+        status, *rest = result
+        if self._decode(status) != CLOSED:
+            return None
+
+        round_index, finished, *players = rest
+
+        results = []
+        for i in range(0, len(players), 5):
+            username, option, correct, added_score, score = players[i:i + 5]
+            option = self._decode(option)
+
+            results.append({
+                "username": self._decode(username),
+                "option_index": int(option) if option else None,
+                "correct": correct == 1,
+                "added_score": added_score,
+                "score": score,
+            })
+
+        return {
+            "round": round_index,
+            "finished": finished == 1,
+            "next_deadline": None if finished == 1 else now + self.round_seconds,
+            "results": results,
+        }
+
+    @staticmethod
+    def _decode(value):
+        return value if isinstance(value, str) else value.decode()
+
+
+class AsyncBattleState(BattleState):
+    """
+    The `BattleState` for `redis.asyncio` clients, used by the async game consumer.
+    """
+
+    async def start(self, room_name: str, usernames, problems, now=None):
+        mapping = self._start_mapping(usernames, problems, time.time() if now is None else now)
+
+        async with self.client.pipeline(transaction=True) as pipe:
+            pipe.delete(self.key(room_name))
+            pipe.hset(self.key(room_name), mapping=mapping)
+            pipe.expire(self.key(room_name), BATTLE_TTL)
+            await pipe.execute()
+
+        return mapping["deadline"]
+
+    async def answer(self, room_name: str, username: str, option_index, round_index=None, now=None):
+        now = time.time() if now is None else now
+        result = await self._round(**self._answer_params(room_name, username, option_index, round_index, now))
+        return self._parse(result, now)
+
+    async def timeout(self, room_name: str, round_index: int, now=None):
+        now = time.time() if now is None else now
+        return self._parse(await self._round(**self._timeout_params(room_name, round_index, now)), now)
@@ -0,0 +1,235 @@
+import gzip
+import hashlib
+import json
+import threading
+
+from django.db.models import Prefetch
+
+from .models import Problem, Word, Definition
+from .problem_pool import POOL_VERSION_KEY
+from .redis_client import r
+from .word_list import CORPUS_VERSION_KEY, serialize_shared_word
+
+try:
+    import brotli
+except ImportError:
+    # the bundles are only gzipped without the brotli package
+    brotli = None
+
+BROTLI = "br"
+GZIP = "gzip"
+IDENTITY = "identity"
+
+MANIFEST_PREFIX = "bundle_manifest"
+# the deltas are computed against the manifests of the bundles served in the last week
+MANIFEST_TTL = 7 * 24 * 60 * 60
+
+
+def negotiate_encoding(accept_encoding):
+    """
+    Pick the content encoding of a bundle from the `Accept-Encoding` header, brotli first.
+    """
+    accepted = set()
+    for coding in (accept_encoding or "").split(","):
+        name, *params = [part.strip() for part in coding.split(";")]
+        if quality(params) > 0:
+            accepted.add(name.lower())
+
+    if BROTLI in accepted and brotli is not None:
+        return BROTLI
+    if GZIP in accepted:
+        return GZIP
+
+    return IDENTITY
+
+
+def quality(params):
+    """
+    The q-value of a coding of `Accept-Encoding`, like `q=0.5`, where a malformed value rejects the coding.
+    """
+    for param in params:
+        name, _, value = param.partition("=")
+        if name.strip().lower() == "q":
+            try:
+                return float(value)
+            except ValueError:
+                return 0.0
+
+    return 1.0
+
+
+def digest(entry):
+    return hashlib.sha1(json.dumps(entry, sort_keys=True).encode()).hexdigest()
+
+
+def compress(data: bytes, encoding):
+    if encoding == BROTLI:
+        return brotli.compress(data)
+    if encoding == GZIP:
+        return gzip.compress(data)
+
+    return data
+
+
+class Bundle:
+    """
+    One version of the problems of a field and of the words they refer to.
+
+    The problems are keyed by their `hash_problem` id and the words by their text, each with a hash of its
+    serialized entry, so an edit of a problem or of a word is picked up like a new entry. The answers of
+    the problems are left out of the bundle, the battles are scored by the server, but `problem_hashes`
+    may cover them so that a client still resyncs an edited problem. The ETag of the bundle is a hash of
+    both, so it only depends on the content, and the manifest of the hashes is kept in redis under the
+    ETag to compute the delta from the bundle a client already holds.
+    """
+
+    def __init__(self, field, problems, words, problem_hashes=None):
+        self.field = field
+        self.problems = problems
+        self.words = words
+        self.problem_hashes = problem_hashes or {
+            problem_id: digest(problem) for problem_id, problem in problems.items()
+        }
+        self.word_hashes = {word: digest(entry) for word, entry in words.items()}
+
+        etag = hashlib.sha256()
+        for problem_id in sorted(problems):
+            etag.update(f"{problem_id}\0{self.problem_hashes[problem_id]}".encode())
+        for word in sorted(words):
+            etag.update(f"{word}\0{self.word_hashes[word]}".encode())
+        self.etag = etag.hexdigest()[:32]
+
+        self._bodies = {}
+
+    def manifest(self):
+        return {"problems": self.problem_hashes, "words": self.word_hashes}
+
+    def payload(self, base=None, manifest=None):
+        """
+        The bundle in the format returned by `ProblemBundleAPI.get`, or its delta from the manifest of the
+        `base` bundle.
+        """
+        if manifest is None:
+            return {
+                "field": self.field,
+                "etag": self.etag,
+                "base": None,
+                "problems": list(self.problems.values()),
+                "words": list(self.words.values()),
+                "removedProblems": [],
+                "removedWords": [],
+            }
+
+        base_problems = manifest["problems"]
+        base_words = manifest["words"]
+
+        return {
+            "field": self.field,
+            "etag": self.etag,
+            "base": base,
+            "problems": [
+                problem for problem_id, problem in self.problems.items()
+                if base_problems.get(problem_id) != self.problem_hashes[problem_id]
+            ],
+            "words": [
+                entry for word, entry in self.words.items() if base_words.get(word) != self.word_hashes[word]
+            ],
+            "removedProblems": sorted(set(base_problems).difference(self.problems)),
+            "removedWords": sorted(set(base_words).difference(self.words)),
+        }
+
+    def body(self, encoding, base=None, manifest=None):
+        """
+        The compressed payload, cached per base bundle and encoding.
+        """
+        key = (base if manifest is not None else None, encoding)
+
+        body = self._bodies.get(key)
+        if body is None:
+            data = json.dumps(self.payload(base, manifest), separators=(",", ":")).encode()
+            body = self._bodies[key] = compress(data, encoding)
+
+        return body
+
+
+class ProblemBundles:
+    """
+    In-process bundles of the problems per field, for the clients caching the corpus.
+
+    A bundle is built on the first request with three queries, and its compressed bodies are kept with it.
+    The bundles are invalidated across every process with the battle problem pools and the word lists, by
+    their version counters in redis, so a request only costs a single redis `MGET` once the bundle is built.
+    """
+
+    def __init__(self, client=r):
+        self.client = client
+        self._bundles = {}
+        self._version = None
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def manifest_key(field, etag):
+        return f"{MANIFEST_PREFIX}_{field}_{etag}"
+
+    def get_bundle(self, field):
+        self._check_version()
+
+        bundle = self._bundles.get(field)
+        if bundle is not None:
+            return bundle
+
+        with self._lock:
+            if field not in self._bundles:
+                bundle = self._load(field)
+                self.client.set(self.manifest_key(field, bundle.etag), json.dumps(bundle.manifest()),
+                                ex=MANIFEST_TTL)
+                self._bundles[field] = bundle
+
+            return self._bundles[field]
+
+    def render(self, field, encoding, since=None):
+        """
+        Get the bundle of the field and its body, the delta from the bundle `since` if its manifest is
+        still kept, or the full bundle otherwise.
+        """
+        bundle = self.get_bundle(field)
+
+        manifest = None
+        if since:
+            manifest = self.client.get(self.manifest_key(field, since))
+            manifest = json.loads(manifest) if manifest is not None else None
+
+        return bundle, bundle.body(encoding, since, manifest)
+
+    def _check_version(self):
+        version = tuple(self.client.mget(POOL_VERSION_KEY, CORPUS_VERSION_KEY))
+        if version != self._version:
+            with self._lock:
+                self._bundles = {}
+                self._version = version
+
+    @staticmethod
+    def _load(field):
+        problems = {}
+        problem_hashes = {}
+        for hashed_id, problem, options, answer, word in Problem.objects.filter(field=field).values_list(
+                'hashed_id', 'problem', 'options', 'answer', 'word_id'):
+            problems[hashed_id] = {
+                "problem_id": hashed_id,
+                "problem": problem,
+                "options": options,
+                "word": word,
+            }
+            # the answer is only hashed, not sent
+            problem_hashes[hashed_id] = digest({**problems[hashed_id], "answer": answer})
+
+        word_ids = {problem["word"] for problem in problems.values()}
+        words = Word.objects.filter(word__in=word_ids).prefetch_related(
+            Prefetch('definition_set', queryset=Definition.objects.order_by('id'), to_attr='definitions'),
+        )
+
+        words = {word.word: serialize_shared_word(word) for word in words}
+        return Bundle(field, problems, words, problem_hashes)
+
+
+problemBundles = ProblemBundles()
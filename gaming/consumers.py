@@ -1,38 +1,84 @@
-import json
+import time
 import random
+import asyncio
 
 import redis.cache
 
-from gaming.models import User, Problem
-from channels.generic.websocket import WebsocketConsumer
-from asgiref.sync import async_to_sync
+from gaming.algo import INITIAL_RATING, rating_window
+from gaming.models import User, UserStats
+from gaming.matchmaking import MatchMaker, AsyncMatchMaker, GUEST, EMPTY, HEARTBEAT_INTERVAL
+from gaming.battle import BattleState, AsyncBattleState
+from gaming.protocol import JSONCodec, get_codec
+from gaming.problem_pool import problemPool
+from gaming.redis_client import r, ar
+from channels.generic.websocket import WebsocketConsumer, AsyncWebsocketConsumer
+from channels.db import database_sync_to_async
+from asgiref.sync import async_to_sync, sync_to_async
 from urllib.parse import parse_qs
-import os
-# redis
-import redis
-
-r = redis.StrictRedis(
-    host=os.environ.get('REDIS_HOST'),
-    port=os.environ.get('REDIS_PORT'),
-    decode_responses=True,
-    username=os.environ.get('REDIS_USERNAME'),
-    password=os.environ.get('REDIS_PASSWORD')
-)
+
+matchMaker = MatchMaker(r)
+asyncMatchMaker = AsyncMatchMaker(ar)
+battleState = BattleState(r)
+asyncBattleState = AsyncBattleState(ar)
+
+# the round timers fire a little after the deadline, so the round is always expired in redis
+ROUND_TIMER_SLACK = 0.1
 
 # Set random seed based on current time
 random.seed()
 
-ROOM_PREFIX = "room"
-ROOM_HOST_POSTFIX = "host"
 COMPUTER_USER_ID = "Adjff13026887732F1"
 
 
+def getBattleDifficulty(usernames):
+    """
+    Get the difficulty in [0, 1] matching the overall correct rate of the players, with one query over
+    their stats rows, or None if none of them has answered yet.
+    """
+    answers = corrects = 0
+    for answer_count, correct_count in UserStats.objects.filter(
+            user__username__in=usernames).values_list('answer_count', 'correct_count'):
+        answers += answer_count
+        corrects += correct_count
+
+    if answers == 0:
+        return None
+
+    return 1 - corrects / answers
+
+
+def getBattleProblems(challenge, level, k=5, difficulty=None):
+    """
+    Draw k random problems of the challenge with their options shuffled, around the difficulty if specified.
+    For GRE, only the problems whose word level is under the level of the battle are drawn.
+    """
+    return problemPool.draw(challenge, level, k, difficulty)
+
+
+def getPlayerRating(username):
+    rating = User.objects.filter(username=username).values_list('rating', flat=True).first()
+    return INITIAL_RATING if rating is None else rating
+
+
+def getPlayerName(username):
+    player, created = User.objects.get_or_create(
+        username=username,
+        defaults={
+            "email": f"{username}@gmail.com",
+            "name": "User",
+        }
+    )
+
+    return player.name
+
+
 class GameConsumer(WebsocketConsumer):
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
         self.isMatched = False
         self.roomName = None
         self.use_agent = False
+        self.codec = JSONCodec()
 
     def connect(self):
         """
@@ -58,15 +104,14 @@ class GameConsumer(WebsocketConsumer):
                     {
                         'problem': '',
                         'options': ['','','',''],
-                        'answer': 2
                     },
                     {
                         'problem': '',
                         'options': ['','','',''],
-                        'answer': 1,
                     },
                 ],
             "userIDs": ["Daniel", "Jimmy"],
+            "round_seconds": 20,
         }
         ```
 
@@ -75,6 +120,8 @@ class GameConsumer(WebsocketConsumer):
         **Player enters queue**: When the first player joins, they are assigned to a queue.\n
         **Assign room ID**: The player is either assigned a new room ID (if they are the first) or matched with another player in the queue. The room ID would be the host userID\n
         **Remove matched players**: Once two players are assigned to the same room, remove them from the queue and establish the battle room.\n
+        **Match by rating**: The player is matched with the waiting player of the nearest rating, within a window widening
+        with the wait of the host, see `MatchMaker`.\n
         **Player cancelled**: If host player cancelled matching, we should record the roomName in redis server, while anyone match the cancelled room, they would move to the next room until the roomName is not recorded as cancelled.
         The roomName that has been matched as cancelled would then be remove from the cancelled record.
         """
@@ -103,39 +150,34 @@ class GameConsumer(WebsocketConsumer):
             self.username = self.username[0]
             challenge = challenge[0]
 
-            # get waiting list
-            self.challengeRoomKey = f'{challenge}_{level}_waiting'
-            waitingRoom = r.lpop(self.challengeRoomKey)
-            # print("\nget waiting ID", waitingRoom)
+            # reject the handshake of an unknown encoding
+            try:
+                self.codec = get_codec(query)
+            except ValueError:
+                self.close()
+                return
 
-            # if no waiting list
-            if waitingRoom is None:
-                print("no waiting list, push room")
-                self.pushRoom(self.username)
+            # get waiting queue
+            self.challenge, self.level = challenge, level
+            self.challengeRoomKey = f'{challenge}_{level}_queue'
+            self.rating = getPlayerRating(self.username)
+            self.waitingSince = time.time()
+            role, self.roomName, hostUsername = matchMaker.join(
+                self.challengeRoomKey,
+                self.username,
+                self.rating,
+                # the computer user plays with anyone
+                window=None if self.username == COMPUTER_USER_ID else rating_window(0),
+                # don't push computer user to the queue
+                can_host=self.username != COMPUTER_USER_ID,
+            )
 
-            # if someone's waiting
-            else:
-                print("someone's waiting")
-                waitingRoom = waitingRoom if isinstance(
-                    waitingRoom, str) else waitingRoom.decode()
-                while r.get(waitingRoom):
-                    r.delete(waitingRoom)  # remove canceled reord
-                    print("remove canceled reord", waitingRoom)
-                    waitingRoom = r.lpop(self.challengeRoomKey)
-
-                    if waitingRoom is None:
-                        break
-
-                    waitingRoom = waitingRoom if isinstance(
-                        waitingRoom, str) else waitingRoom.decode()
-
-                # if it does find match in waiting list
-                if waitingRoom is not None:
-                    print("find match", waitingRoom)
-                    self.roomName = waitingRoom
-                # if it go the end of the waiting list but still does not find available room
-                else:
-                    self.pushRoom(self.username)
+            if role == EMPTY:
+                raise ValueError("computer user cannot be pushed to the queue")
+
+            # if no waiting list, the player hosts the room
+            waitingRoom = self.roomName if role == GUEST else None
+            print("role", role, "room", self.roomName)
 
             print("add to group", self.roomName)
             async_to_sync(self.channel_layer.group_add)(
@@ -147,90 +189,18 @@ class GameConsumer(WebsocketConsumer):
 
             # if the player is host
             if waitingRoom is None:
-                self.send(text_data=json.dumps({
+                self.sendMessage({
                     "type": "wait",
-                }))
+                })
+                self.scheduleHeartbeat()
 
             # if the player is guest who match the host
             else:
-                # set group send to all consumer to set isMatched variable
-                async_to_sync(self.channel_layer.group_send)(
-                    self.roomName,
-                    {
-                        "type": "setIsMatched",
-                        "isMatched": True
-                    }
-                )
-
-                # TODO: read from database
-                problems = None
-
-                # read from database
-                problem_ids = list(Problem.objects.filter(
-                    field=challenge).values_list('hashed_id', flat=True))
-
-                if challenge == 'gre':
-                    problem_ids = list(
-                        Problem.objects.filter(
-                            field=challenge,
-                            word__level__lte=(1+level) * 4,
-                        ).values_list('hashed_id', flat=True)
-                    )
-                random_problem_ids = random.sample(
-                    problem_ids, min(5, len(problem_ids)))
-
-                problems = []
-                for p in Problem.objects.filter(hashed_id__in=random_problem_ids):
-                    ans = p.options[p.answer]
-                    problem_item = {
-                        "problem_id": p.hashed_id,
-                        "problem": p.problem,
-                        "options": random.sample(p.options, len(p.options)),
-                    }
-
-                    problem_item['answer'] = problem_item['options'].index(ans)
-
-                    problems.append(problem_item)
-
-                print(problems)
-
-                hostUsername = r.get(f"{self.roomName}_{ROOM_HOST_POSTFIX}")
-                hostUsername = hostUsername if isinstance(
-                    hostUsername, str) else hostUsername.decode()
-
-                hostUser, created = User.objects.get_or_create(
-                    username=hostUsername,
-                    defaults={
-                        "email": f"{hostUsername}@gmail.com",
-                        "name": "User",
-                    }
-                )
-
-                hostName = hostUser.name
-                player, created = User.objects.get_or_create(
-                    username=self.username,
-                    defaults={
-                        "email": f"{self.username}@gmail.com",
-                        "name": "User",
-                    }
-                )
-
-                playerName = player.name
-
-                async_to_sync(self.channel_layer.group_send)(
-                    self.roomName,
-                    {
-                        "type": "startGame",
-                        "problems": problems,
-                        "usernames": [hostUsername, self.username],
-                        "names": [hostName, playerName],
-                    },
-                )
-                r.delete(f"{self.roomName}_{ROOM_HOST_POSTFIX}")
+                self.startBattle(hostUsername)
 
         except ValueError as e:
-            self.send(json.dumps(
-                {"error": f"cannot push computer user to the queue"}))
+            self.sendMessage(
+                {"error": f"cannot push computer user to the queue"})
             self.close()
 
         except Exception as e:
@@ -238,6 +208,41 @@ class GameConsumer(WebsocketConsumer):
             self.close()
             raise e
 
+    def startBattle(self, hostUsername):
+        """
+        Start the battle with the host of the room, as the guest.
+        """
+        # set group send to all consumer to set isMatched variable
+        async_to_sync(self.channel_layer.group_send)(
+            self.roomName,
+            {
+                "type": "setIsMatched",
+                "isMatched": True
+            }
+        )
+
+        difficulty = getBattleDifficulty([hostUsername, self.username])
+        problems = getBattleProblems(self.challenge, self.level, difficulty=difficulty)
+        print(problems)
+
+        hostName = getPlayerName(hostUsername)
+        playerName = getPlayerName(self.username)
+
+        deadline = battleState.start(self.roomName, [hostUsername, self.username], problems)
+
+        async_to_sync(self.channel_layer.group_send)(
+            self.roomName,
+            {
+                "type": "startGame",
+                "problems": problems,
+                "usernames": [hostUsername, self.username],
+                "names": [hostName, playerName],
+                "round_seconds": battleState.round_seconds,
+            },
+        )
+
+        self.scheduleTimeout(0, deadline)
+
     def disconnect(self, code):
         """
         The behaviour of the consumer when its client has disconnected. The following behavoir is expected
@@ -253,9 +258,10 @@ class GameConsumer(WebsocketConsumer):
         """
         The behavior of the backend when client has send to the game consumer. The following behavior is expected:
 
-        1) The text message with json format including *score* and are received from the two clients
-        2) A json format message that include the added_score and added_combo of the player who sent message are group_sent to both clients
-        3) When both clients have sent the message to the server, the server would send message to both clients with "go next round" command
+        1) The text message with json format including the *optionIndex* of the current round are received from the two clients
+        2) The answer is recorded and scored by the server against the problems sent by `startGame`, see `gaming.battle.BattleState`
+        3) When both clients have answered, or the deadline of the round has passed, a single round result with the answers and
+        the scores of both players is group_sent to both clients, which go to the next round
         4) NOTE: The end game message should be sent with http method, to avoid the repetition of memory update
         ========================\n
         ### Input format
@@ -264,32 +270,43 @@ class GameConsumer(WebsocketConsumer):
         ```
         {
             'type': 'answer',
-            'userID': daniel_00,
             'optionIndex': 2, # the index of the option that the user selected, could be null
-            'score': 200,
+            'round': 0, # optional, the answer is dropped if the round is over
         }
         ```
+        The `userID` and `score` sent by the former clients are ignored, the player is the user of the socket
+        and the score is computed by the server.
         ### Return Format
-        For the answer type response, the format should be
+        For the round result response, the format should be
         ```
         {
-            'type': 'answer',
-            'answered_user': answerUserId,
-            'option_index': 2,
-            'added_score': 200
+            'type': 'round_result',
+            'round': 0,
+            'finished': False,
+            'next_deadline': 1700000000.0, # the unix time the next round closes at, null if finished
+            'results': [
+                {
+                    'username': 'daniel_00',
+                    'option_index': 2,
+                    'correct': True,
+                    'added_score': 180,
+                    'score': 380, # the cumulative score
+                },
+                ...
+            ]
         }
         ```
         """
 
-        requiredField = ['type', 'userID', 'score']
+        requiredField = ['type', 'optionIndex']
 
         try:
-            decodedContent = json.loads(text_data)
+            decodedContent = self.codec.decode(text_data, bytes_data)
             contentType = decodedContent.get("type", None)
 
             if contentType is None:
-                self.send(json.dumps(
-                    {"error": "contentType field shoud not be None in json data"}))
+                self.sendMessage(
+                    {"error": "contentType field shoud not be None in json data"})
                 self.close()
                 return
 
@@ -298,45 +315,32 @@ class GameConsumer(WebsocketConsumer):
                 # check if the required field is in the json data
                 for field in requiredField:
                     if field not in decodedContent:
-                        self.send(json.dumps(
-                            {"error": f"required field '{field}' is not in the json data"}))
+                        self.sendMessage(
+                            {"error": f"required field '{field}' is not in the json data"})
                         self.close()
                         return
 
-                async_to_sync(self.channel_layer.group_send)(
-                    self.roomName,
-                    {
-                        'type': 'answer',
-                        'answered_user': decodedContent["userID"],
-                        'option_index': decodedContent.get("optionIndex", None),
-                        'added_score': decodedContent["score"],
-                    }
-                )
+                result = battleState.answer(
+                    self.roomName, self.username, decodedContent["optionIndex"], decodedContent.get("round"))
+
+                # only the answer closing the round is sent back
+                if result is not None:
+                    self.sendRoundResult(result)
 
                 return
 
             print("invalid contentType", contentType)
-            self.send(json.dumps(
-                {"error": f"invalid contentType '{contentType}"}))
+            self.sendMessage(
+                {"error": f"invalid contentType '{contentType}"})
             self.close()
 
         except Exception as e:
             print(
                 f"excepction '{e}' occurs as game consumer received data from client")
-            self.send(json.dumps(
-                {'error': f"exception '{e}' occurs as game consumer received data from client"}))
+            self.sendMessage(
+                {'error': f"exception '{e}' occurs as game consumer received data from client"})
             raise e
 
-    def pushRoom(self, userID):
-        # don't push computer user to the queue
-        if userID == COMPUTER_USER_ID:
-            raise ValueError("computer user cannot be pushed to the queue")
-
-        hashedUserID = hash(userID)
-        self.roomName = f"{ROOM_PREFIX}_{hashedUserID}_{self.challengeRoomKey}"
-        r.rpush(self.challengeRoomKey, self.roomName)
-        r.set(f"{self.roomName}_{ROOM_HOST_POSTFIX}", userID)
-
     def recordCancel(self):
         """
         Record the roomName in redis cache if the player is host and have not found match.
@@ -347,24 +351,352 @@ class GameConsumer(WebsocketConsumer):
         # the player is host and have been added to the waiting list with matching haven't occured yet
         if not self.isMatched and self.roomName is not None:
             # print(f"recording {self.roomName} to cancel table")
-            r.set(self.roomName, 1)  # The roomName being true means that the
-            r.delete(f"{self.roomName}_{ROOM_HOST_POSTFIX}")
+            matchMaker.cancel(self.roomName)
 
-    def answer(self, event):
-        self.send(json.dumps({
-            'type': 'answer',
-            'answered_user': event.get('answered_user'),
-            'added_score': event.get('added_score'),
-            'option_index': event.get('option_index'),
-        }))
+    def scheduleHeartbeat(self):
+        """
+        Keep the room of the host alive in the waiting queue until it is matched or cancelled, and look for
+        a match with the rating window widened by the wait, see `MatchMaker.rematch`.
+        """
+        async_to_sync(self.startHeartbeat)()
+
+    async def startHeartbeat(self):
+        asyncio.ensure_future(self.sendHeartbeats())
+
+    async def sendHeartbeats(self):
+        while not self.isMatched:
+            await asyncio.sleep(HEARTBEAT_INTERVAL)
+
+            window = rating_window(time.time() - self.waitingSince)
+            role, roomName, hostUsername = await sync_to_async(matchMaker.rematch, thread_sensitive=False)(
+                self.challengeRoomKey, self.username, self.rating, window)
+            if role == EMPTY:
+                return
+
+            if role == GUEST:
+                # the host leaves its room to join the room of the matched player
+                await self.channel_layer.group_discard(self.roomName, self.channel_name)
+                self.roomName = roomName
+                await self.channel_layer.group_add(self.roomName, self.channel_name)
+
+                await sync_to_async(self.startBattle, thread_sensitive=False)(hostUsername)
+                return
+
+    def scheduleTimeout(self, roundIndex, deadline):
+        """
+        Close the round at its deadline if a player has not answered by then.
+        The timer is left running if the player leaves, so the round of the other player is still closed.
+        """
+        async_to_sync(self.startTimer)(roundIndex, deadline)
+
+    async def startTimer(self, roundIndex, deadline):
+        # the timer runs on the event loop of the consumer, like the channel layer calls
+        asyncio.ensure_future(self.closeRoundAt(roundIndex, deadline))
+
+    async def closeRoundAt(self, roundIndex, deadline):
+        await asyncio.sleep(max(deadline - time.time(), 0) + ROUND_TIMER_SLACK)
+
+        # the request of the consumer may be over, so the sync client is called out of its thread
+        result = await sync_to_async(battleState.timeout, thread_sensitive=False)(self.roomName, roundIndex)
+        if result is None:
+            return
+
+        await self.channel_layer.group_send(
+            self.roomName,
+            {
+                "type": "roundResult",
+                **result,
+            }
+        )
+
+        if not result["finished"]:
+            await self.startTimer(result["round"] + 1, result["next_deadline"])
+
+    def sendRoundResult(self, result):
+        async_to_sync(self.channel_layer.group_send)(
+            self.roomName,
+            {
+                "type": "roundResult",
+                **result,
+            }
+        )
+
+        if not result["finished"]:
+            self.scheduleTimeout(result["round"] + 1, result["next_deadline"])
+
+    def sendMessage(self, message):
+        """
+        Send the message in the encoding negotiated by the client, see `gaming.protocol`.
+        """
+        self.send(**self.codec.encode(message))
+
+    def roundResult(self, event):
+        self.sendMessage({
+            'type': 'round_result',
+            'round': event["round"],
+            'finished': event["finished"],
+            'next_deadline': event["next_deadline"],
+            'results': event["results"],
+        })
 
     def startGame(self, event):
-        self.send(json.dumps({
+        self.sendMessage({
             'type': 'start_game',
             "problems": event["problems"],
             "usernames": event["usernames"],
             "names": event["names"],
-        }))
+            "round_seconds": event["round_seconds"],
+        })
 
     def setIsMatched(self, event):
         self.isMatched = event["isMatched"]
+
+
+class AsyncGameConsumer(AsyncWebsocketConsumer):
+    """
+    The async implementation of `GameConsumer` served on the `battle_async` route.
+
+    The consumer follows the same matching and message protocol as `GameConsumer`, but the redis calls
+    are made with `redis.asyncio` and the channel layer calls are awaited directly, so the battle sockets
+    share the event loop of daphne instead of pinning a worker thread each. Only the ORM hops of the
+    battle start are run in the thread pool with `database_sync_to_async`.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.isMatched = False
+        self.roomName = None
+        self.use_agent = False
+        self.codec = JSONCodec()
+
+    async def connect(self):
+        """
+        See `GameConsumer.connect` for the input and return format.
+        """
+        try:
+            query = parse_qs(self.scope['query_string'].decode())
+
+            self.username = query.get('user', None)
+            challenge = query.get('challenge', None)
+            level = int(query.get('level', ['0'])[0])
+
+            if self.username is None:
+                await self.send("self.username is not provided in url")
+                await self.close()
+                return
+
+            if challenge is None:
+                await self.send("challenge is not provided in url")
+                await self.close()
+                return
+
+            self.username = self.username[0]
+            challenge = challenge[0]
+
+            try:
+                self.codec = get_codec(query)
+            except ValueError:
+                await self.close()
+                return
+
+            # get waiting queue
+            self.challenge, self.level = challenge, level
+            self.challengeRoomKey = f'{challenge}_{level}_queue'
+            self.rating = await database_sync_to_async(getPlayerRating)(self.username)
+            self.waitingSince = time.time()
+            role, self.roomName, hostUsername = await asyncMatchMaker.join(
+                self.challengeRoomKey,
+                self.username,
+                self.rating,
+                # the computer user plays with anyone
+                window=None if self.username == COMPUTER_USER_ID else rating_window(0),
+                # don't push computer user to the queue
+                can_host=self.username != COMPUTER_USER_ID,
+            )
+
+            if role == EMPTY:
+                raise ValueError("computer user cannot be pushed to the queue")
+
+            await self.channel_layer.group_add(
+                self.roomName,
+                self.channel_name,
+            )
+
+            await self.accept()
+
+            # if the player is host
+            if role != GUEST:
+                await self.sendMessage({
+                    "type": "wait",
+                })
+                self.scheduleHeartbeat()
+                return
+
+            # if the player is guest who match the host
+            await self.startBattle(hostUsername)
+
+        except ValueError as e:
+            await self.sendMessage(
+                {"error": f"cannot push computer user to the queue"})
+            await self.close()
+
+        except Exception as e:
+            await self.close()
+            raise e
+
+    async def startBattle(self, hostUsername):
+        """
+        See `GameConsumer.startBattle`.
+        """
+        await self.channel_layer.group_send(
+            self.roomName,
+            {
+                "type": "setIsMatched",
+                "isMatched": True
+            }
+        )
+
+        difficulty = await database_sync_to_async(getBattleDifficulty)([hostUsername, self.username])
+        problems = await database_sync_to_async(getBattleProblems)(
+            self.challenge, self.level, difficulty=difficulty)
+        hostName = await database_sync_to_async(getPlayerName)(hostUsername)
+        playerName = await database_sync_to_async(getPlayerName)(self.username)
+
+        deadline = await asyncBattleState.start(self.roomName, [hostUsername, self.username], problems)
+
+        await self.channel_layer.group_send(
+            self.roomName,
+            {
+                "type": "startGame",
+                "problems": problems,
+                "usernames": [hostUsername, self.username],
+                "names": [hostName, playerName],
+                "round_seconds": asyncBattleState.round_seconds,
+            },
+        )
+
+        self.scheduleTimeout(0, deadline)
+
+    async def disconnect(self, code):
+        await self.recordCancel()
+
+    async def receive(self, text_data=None, bytes_data=None):
+        """
+        See `GameConsumer.receive` for the input and return format.
+        """
+        requiredField = ['type', 'optionIndex']
+
+        try:
+            decodedContent = self.codec.decode(text_data, bytes_data)
+            contentType = decodedContent.get("type", None)
+
+            if contentType is None:
+                await self.sendMessage(
+                    {"error": "contentType field shoud not be None in json data"})
+                await self.close()
+                return
+
+            if contentType == 'answer':
+                for field in requiredField:
+                    if field not in decodedContent:
+                        await self.sendMessage(
+                            {"error": f"required field '{field}' is not in the json data"})
+                        await self.close()
+                        return
+
+                result = await asyncBattleState.answer(
+                    self.roomName, self.username, decodedContent["optionIndex"], decodedContent.get("round"))
+
+                if result is not None:
+                    await self.sendRoundResult(result)
+
+                return
+
+            await self.sendMessage(
+                {"error": f"invalid contentType '{contentType}"})
+            await self.close()
+
+        except Exception as e:
+            await self.sendMessage(
+                {'error': f"exception '{e}' occurs as game consumer received data from client"})
+            raise e
+
+    async def recordCancel(self):
+        """
+        See `GameConsumer.recordCancel`.
+        """
+        if not self.isMatched and self.roomName is not None:
+            await asyncMatchMaker.cancel(self.roomName)
+
+    def scheduleHeartbeat(self):
+        """
+        See `GameConsumer.scheduleHeartbeat`.
+        """
+        asyncio.ensure_future(self.sendHeartbeats())
+
+    async def sendHeartbeats(self):
+        while not self.isMatched:
+            await asyncio.sleep(HEARTBEAT_INTERVAL)
+
+            window = rating_window(time.time() - self.waitingSince)
+            role, roomName, hostUsername = await asyncMatchMaker.rematch(
+                self.challengeRoomKey, self.username, self.rating, window)
+            if role == EMPTY:
+                return
+
+            if role == GUEST:
+                await self.channel_layer.group_discard(self.roomName, self.channel_name)
+                self.roomName = roomName
+                await self.channel_layer.group_add(self.roomName, self.channel_name)
+
+                await self.startBattle(hostUsername)
+                return
+
+    def scheduleTimeout(self, roundIndex, deadline):
+        """
+        See `GameConsumer.scheduleTimeout`.
+        """
+        asyncio.ensure_future(self.closeRound(roundIndex, deadline))
+
+    async def closeRound(self, roundIndex, deadline):
+        await asyncio.sleep(max(deadline - time.time(), 0) + ROUND_TIMER_SLACK)
+
+        result = await asyncBattleState.timeout(self.roomName, roundIndex)
+        if result is not None:
+            await self.sendRoundResult(result)
+
+    async def sendRoundResult(self, result):
+        await self.channel_layer.group_send(
+            self.roomName,
+            {
+                "type": "roundResult",
+                **result,
+            }
+        )
+
+        if not result["finished"]:
+            self.scheduleTimeout(result["round"] + 1, result["next_deadline"])
+
+    async def sendMessage(self, message):
+        await self.send(**self.codec.encode(message))
+
+    async def roundResult(self, event):
+        await self.sendMessage({
+            'type': 'round_result',
+            'round': event["round"],
+            'finished': event["finished"],
+            'next_deadline': event["next_deadline"],
+            'results': event["results"],
+        })
+
+    async def startGame(self, event):
+        await self.sendMessage({
+            'type': 'start_game',
+            "problems": event["problems"],
+            "usernames": event["usernames"],
+            "names": event["names"],
+            "round_seconds": event["round_seconds"],
+        })
+
+    async def setIsMatched(self, event):
+        self.isMatched = event["isMatched"]
@@ -0,0 +1,156 @@
+import json
+
+CHUNK_SIZE = 1 << 16
+NUMBER_CHARS = "0123456789+-.eE"
+
+
+class JSONStreamReader:
+    """
+    Incremental reader of a JSON document made of objects nested in a top-level array or object.
+
+    The file is read in fixed-size chunks, and every item of the top-level container is decoded with
+    `json.JSONDecoder.raw_decode` as soon as it is complete, so only one chunk and the item being decoded
+    are kept in memory. The items may be any JSON value: a value decoded up to the end of the buffer is
+    decoded again with the next chunk, so a number split across chunks is never cut short.
+    """
+
+    def __init__(self, f, chunk_size=CHUNK_SIZE):
+        self.f = f
+        self.chunk_size = chunk_size
+        self.decoder = json.JSONDecoder()
+        self.buffer = ""
+        self.pos = 0
+        self.eof = False
+
+    def iter_array(self):
+        """
+        Yield the items of a top-level array.
+        """
+        self._expect("[")
+        yield from self._iter_items("]")
+
+    def iter_object_arrays(self):
+        """
+        Yield `(key, item)` for the items of the arrays in a top-level object, like `{"key": [item, ...]}`.
+        """
+        self._expect("{")
+        if self._peek() == "}":
+            self.pos += 1
+            return
+
+        while True:
+            key = self._decode()
+            self._expect(":")
+            self._expect("[")
+            for item in self._iter_items("]"):
+                yield key, item
+
+            if self._next() == "}":
+                return
+
+    def _iter_items(self, end):
+        if self._peek() == end:
+            self.pos += 1
+            return
+
+        while True:
+            yield self._decode()
+
+            char = self._next()
+            if char == end:
+                return
+            if char != ",":
+                raise ValueError(f"expect ',' or '{end}' but get '{char}'")
+
+    def _decode(self):
+        self._peek()
+        while True:
+            try:
+                value, end = self.decoder.raw_decode(self.buffer, self.pos)
+            except json.JSONDecodeError:
+                if self.eof:
+                    raise
+                self._read()
+                continue
+
+            # a number cut by the end of the buffer, like `12` of `123` or `-4` of `-4.5`, goes on in the
+            # next chunk
+            if not self.eof and (end == len(self.buffer) or self.buffer[end] in NUMBER_CHARS):
+                self._read()
+                continue
+
+            self.pos = end
+            return value
+
+    def _expect(self, expected):
+        char = self._next()
+        if char != expected:
+            raise ValueError(f"expect '{expected}' but get '{char}'")
+
+    def _next(self):
+        char = self._peek()
+        self.pos += 1
+        return char
+
+    def _peek(self):
+        while True:
+            while self.pos < len(self.buffer) and self.buffer[self.pos].isspace():
+                self.pos += 1
+
+            if self.pos < len(self.buffer):
+                return self.buffer[self.pos]
+
+            if self.eof:
+                raise ValueError("unexpected end of JSON document")
+            self._read()
+
+    def _read(self):
+        chunk = self.f.read(self.chunk_size)
+        if not chunk:
+            self.eof = True
+            return
+
+        # drop the consumed part of the buffer
+        self.buffer = self.buffer[self.pos:] + chunk
+        self.pos = 0
+
+
+def iter_json_lines(f):
+    for line in f:
+        line = line.strip()
+        if line:
+            yield json.loads(line)
+
+
+def iter_words(path):
+    """
+    Stream the word entries from a JSON array like `gaming/words.json`, or from JSON Lines (`.jsonl`).
+    """
+    with open(path, "r") as f:
+        if path.endswith(".jsonl"):
+            yield from iter_json_lines(f)
+        else:
+            yield from JSONStreamReader(f).iter_array()
+
+
+def iter_problems(path):
+    """
+    Stream `(field, problem)` from an object of problem lists keyed by field like `gaming/problems.json`,
+    or from JSON Lines (`.jsonl`) of problems carrying their own `field`.
+    """
+    with open(path, "r") as f:
+        if path.endswith(".jsonl"):
+            for problem in iter_json_lines(f):
+                yield problem.pop("field"), problem
+        else:
+            yield from JSONStreamReader(f).iter_object_arrays()
+
+
+def write_json_lines(f, records):
+    count = 0
+    for record in records:
+        f.write(json.dumps(record, ensure_ascii=False))
+        f.write("\n")
+        count += 1
+
+    return count
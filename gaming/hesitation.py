@@ -0,0 +1,159 @@
+import json
+from collections import defaultdict
+from datetime import timedelta
+from uuid import UUID
+
+from django.db import DatabaseError, transaction
+from django.db.models import Case, DurationField, F, IntegerField, Value, When
+
+from .models import Hesitation, HesitationStats, User, Word
+from .redis_client import r
+
+HESITATION_BUFFER_KEY = "hesitation_buffer"
+# the events which can never be written are kept aside for inspection instead of blocking the buffer
+HESITATION_DEAD_LETTER_KEY = "hesitation_dead_letter"
+DEAD_LETTER_SIZE = 1000
+# the seconds between two flushes of `flush_hesitations`
+FLUSH_INTERVAL = 10
+FLUSH_BATCH_SIZE = 1000
+# the number of the flushes an event is put back into the buffer for, when the database fails
+MAX_FLUSH_ATTEMPTS = 3
+
+
+def buffer_hesitations(user, events):
+    """
+    Buffer the hesitation events of the user in redis, with a single round trip.
+    `events` is the list of `{"word": str, "duration": float}` posted to `HesitationAPI.post`, where the
+    duration is in milliseconds.
+    """
+    if not events:
+        return
+
+    r.rpush(HESITATION_BUFFER_KEY, *[
+        json.dumps([str(user.pk), event["word"], event["duration"]]) for event in events
+    ])
+
+
+def flush_hesitations():
+    """
+    Write the buffered hesitations with `bulk_create` and add them to the stats of their words, run
+    periodically by the `flush_hesitations` command.
+
+    The buffer is taken atomically, so the hesitations buffered during the flush are left for the next one.
+    The events which cannot be parsed are moved to the dead letter list, and the hesitations on unknown
+    words or of deleted users are dropped. If the database fails, the taken hesitations are put back into
+    the buffer for at most `MAX_FLUSH_ATTEMPTS` flushes. Return the number of the written hesitations.
+    """
+    pipe = r.pipeline(transaction=True)
+    pipe.lrange(HESITATION_BUFFER_KEY, 0, -1)
+    pipe.delete(HESITATION_BUFFER_KEY)
+    events, _ = pipe.execute()
+
+    if not events:
+        return 0
+
+    hesitations, invalid = [], []
+    for event in events:
+        hesitation = parse_hesitation(event)
+        if hesitation is None:
+            invalid.append(event)
+        else:
+            hesitations.append(hesitation)
+
+    if invalid:
+        dead_letter(invalid)
+
+    try:
+        return write_hesitations(hesitations)
+    except DatabaseError:
+        retried = [
+            json.dumps([str(user_id), word, duration / timedelta(milliseconds=1), attempts + 1])
+            for user_id, word, duration, attempts in hesitations
+        ]
+        if retried:
+            r.rpush(HESITATION_BUFFER_KEY, *retried)
+        raise
+
+
+def parse_hesitation(event):
+    """
+    Parse a buffered `[user_id, word, duration_ms]` or `[user_id, word, duration_ms, attempts]` event into
+    `(user_id, word, duration, attempts)`, or return None if the event is malformed or has been retried
+    `MAX_FLUSH_ATTEMPTS` times.
+    """
+    try:
+        user_id, word, duration, *attempts = json.loads(event)
+        attempts = attempts[0] if attempts else 0
+        if not isinstance(word, str) or attempts >= MAX_FLUSH_ATTEMPTS:
+            return None
+
+        return UUID(user_id), word, timedelta(milliseconds=duration), attempts
+    except (ValueError, TypeError, OverflowError, AttributeError):
+        return None
+
+
+def dead_letter(events):
+    pipe = r.pipeline(transaction=False)
+    pipe.rpush(HESITATION_DEAD_LETTER_KEY, *events)
+    pipe.ltrim(HESITATION_DEAD_LETTER_KEY, -DEAD_LETTER_SIZE, -1)
+    pipe.execute()
+
+
+def write_hesitations(hesitations):
+    """
+    Write `(user_id, word, duration, attempts)` hesitations, with a constant number of queries per batch.
+    """
+    written = 0
+
+    with transaction.atomic():
+        for i in range(0, len(hesitations), FLUSH_BATCH_SIZE):
+            batch = hesitations[i:i + FLUSH_BATCH_SIZE]
+            users = set(User.objects.filter(
+                pk__in={user_id for user_id, _, _, _ in batch}).values_list('pk', flat=True))
+            words = set(Word.objects.filter(
+                word__in={word for _, word, _, _ in batch}).values_list('word', flat=True))
+
+            batch = [
+                Hesitation(user_id=user_id, word_id=word, duration=duration)
+                for user_id, word, duration, _ in batch if user_id in users and word in words
+            ]
+            Hesitation.objects.bulk_create(batch)
+            add_to_stats(batch)
+            written += len(batch)
+
+    return written
+
+
+def add_to_stats(hesitations):
+    """
+    Add the hesitations to the running totals of their words, with one `INSERT` and one `UPDATE`.
+    """
+    counts = defaultdict(int)
+    durations = defaultdict(timedelta)
+    for hesitation in hesitations:
+        counts[hesitation.word_id] += 1
+        durations[hesitation.word_id] += hesitation.duration
+
+    if not counts:
+        return
+
+    HesitationStats.objects.bulk_create(
+        [HesitationStats(word_id=word) for word in counts], ignore_conflicts=True)
+
+    HesitationStats.objects.filter(word__in=counts.keys()).update(
+        hesitation_count=F('hesitation_count') + Case(
+            *[When(word=word, then=Value(count)) for word, count in counts.items()],
+            default=Value(0), output_field=IntegerField(),
+        ),
+        total_duration=F('total_duration') + Case(
+            *[When(word=word, then=Value(duration)) for word, duration in durations.items()],
+            default=Value(timedelta()), output_field=DurationField(),
+        ),
+    )
+
+
+def get_hesitation_stats(words):
+    """
+    Get `{word: HesitationStats}` of the words, for the words with flushed hesitations.
+    """
+    return HesitationStats.objects.in_bulk(words)
@@ -0,0 +1,153 @@
+import time
+from itertools import islice
+
+from django.db import transaction
+
+from .algo import hash_problem
+from .models import Word, Definition, Problem, GRE
+from .problem_pool import problemPool
+from .word_list import bump_corpus_version
+
+BATCH_SIZE = 1000
+
+
+def batched(iterable, size):
+    iterator = iter(iterable)
+    while batch := list(islice(iterator, size)):
+        yield batch
+
+
+def load_words(word_list, batch_size=BATCH_SIZE):
+    """
+    Upsert the words and their definitions in batches.
+
+    `word_list` is an iterable of word entries in the format of `gaming/words.json`, see
+    `gaming.corpus.iter_words` to stream them from a file with bounded memory.
+
+    The words are upserted with a single `INSERT ... ON CONFLICT` per batch, the level of an existing word
+    is updated. The definitions of every entry of a batch, including the repeated entries of a word, are
+    diffed against the existing definitions of the same words, and only the missing ones are inserted.
+    The cached word lists are invalidated after loading.
+
+    Return the loading stats `{"words": int, "definitions": int, "seconds": float, "rows_per_sec": float}`.
+    """
+    start = time.perf_counter()
+    loaded_words = set()
+    definition_count = 0
+
+    with transaction.atomic():
+        for batch in batched(word_list, batch_size):
+            # the level of the last entry of a duplicated word wins, like the sequential updates
+            words = {word["word"]: word for word in batch}
+
+            Word.objects.bulk_create(
+                [
+                    Word(
+                        word=word["word"],
+                        level=word["level"],
+                        test_type=word.get("test_type", GRE),
+                    )
+                    for word in words.values()
+                ],
+                update_conflicts=True,
+                unique_fields=["word"],
+                update_fields=["level"],
+            )
+
+            existing = set(Definition.objects.filter(word__in=words.keys()).values_list(
+                "word_id", "definition", "part_of_speech", "example", "translation"))
+
+            definitions = []
+            for word in batch:
+                for definition in word["definitions"]:
+                    key = (
+                        word["word"],
+                        definition.get("definition", ""),
+                        definition.get("part_of_speech", ""),
+                        definition.get("example", ""),
+                        definition.get("translation", ""),
+                    )
+
+                    if key in existing:
+                        continue
+
+                    existing.add(key)
+                    definitions.append(Definition(
+                        word_id=key[0],
+                        definition=key[1],
+                        part_of_speech=key[2],
+                        example=key[3],
+                        translation=key[4],
+                    ))
+
+            Definition.objects.bulk_create(definitions, batch_size=batch_size)
+
+            loaded_words.update(words)
+            definition_count += len(definitions)
+
+    bump_corpus_version()
+
+    return _stats(start, words=len(loaded_words), definitions=definition_count)
+
+
+def load_problems(entries, batch_size=BATCH_SIZE):
+    """
+    Upsert the problems of every field in batches, keyed by the `hash_problem` id.
+
+    `entries` is an iterable of `(field, problem)`, see `gaming.corpus.iter_problems`.
+    The words referred by the problems are resolved with one query per batch, and the correct rate of an
+    existing problem is kept. The battle problem pools are invalidated after loading.
+
+    Return the loading stats `{"problems": int, "seconds": float, "rows_per_sec": float}`.
+    """
+    start = time.perf_counter()
+    problem_count = 0
+
+    with transaction.atomic():
+        for batch in batched(entries, batch_size):
+            words = Word.objects.in_bulk(
+                {problem["word"] for field, problem in batch if problem.get("word")})
+
+            # the first entry of a duplicated problem wins, like `get_or_create`
+            problems = {}
+            for field, problem in batch:
+                hashed_id = hash_problem(problem)
+                if hashed_id in problems:
+                    continue
+
+                if problem.get("word") and problem["word"] not in words:
+                    print(f"word {problem['word']} of problem {hashed_id} is not found")
+
+                problems[hashed_id] = Problem(
+                    hashed_id=hashed_id,
+                    field=field,
+                    problem=problem["problem"],
+                    options=problem["options"],
+                    answer=problem["answer"],
+                    correct_rate=problem.get("correct_rate", 60.0),
+                    word=words.get(problem.get("word")),
+                )
+
+            Problem.objects.bulk_create(
+                list(problems.values()),
+                update_conflicts=True,
+                unique_fields=["hashed_id"],
+                update_fields=["field", "problem", "options", "answer", "word"],
+            )
+
+            problem_count += len(problems)
+
+    problemPool.invalidate()
+
+    return _stats(start, problems=problem_count)
+
+
+def _stats(start, **counts):
+    seconds = time.perf_counter() - start
+    rows = sum(counts.values())
+
+    return {
+        **counts,
+        "seconds": seconds,
+        "rows_per_sec": rows / seconds if seconds > 0 else 0.0,
+    }
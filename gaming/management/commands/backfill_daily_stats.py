@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand
+
+from gaming.models import User
+from gaming.stats import backfill_daily_stats
+
+
+class Command(BaseCommand):
+    help = "Rebuild the daily stats rollups from the answer and word learning history"
+
+    def add_arguments(self, parser):
+        parser.add_argument("usernames", nargs="*",
+                            help="the users to backfill, every user if not specified")
+
+    def handle(self, *args, **options):
+        users = None
+        if options["usernames"]:
+            users = User.objects.filter(username__in=options["usernames"])
+
+        count = backfill_daily_stats(users)
+        self.stdout.write(self.style.SUCCESS(f"backfilled {count} daily stats rows"))
@@ -0,0 +1,60 @@
+from django.core.management.base import BaseCommand
+from django.db.models import Prefetch
+
+from gaming.corpus import write_json_lines
+from gaming.models import Word, Definition, Problem
+
+CHUNK_SIZE = 2000
+
+
+class Command(BaseCommand):
+    help = "Export the word and problem tables as JSON Lines, readable by load_corpus"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--words", default="words.jsonl",
+                            help="output path of the words, empty to skip")
+        parser.add_argument("--problems", default="problems.jsonl",
+                            help="output path of the problems, empty to skip")
+
+    def handle(self, *args, **options):
+        if options["words"]:
+            with open(options["words"], "w") as f:
+                count = write_json_lines(f, self.iter_words())
+            self.stdout.write(self.style.SUCCESS(f"exported {count} words to {options['words']}"))
+
+        if options["problems"]:
+            with open(options["problems"], "w") as f:
+                count = write_json_lines(f, self.iter_problems())
+            self.stdout.write(self.style.SUCCESS(f"exported {count} problems to {options['problems']}"))
+
+    @staticmethod
+    def iter_words():
+        words = Word.objects.order_by("word").prefetch_related(
+            Prefetch("definition_set", queryset=Definition.objects.order_by("id")))
+
+        for word in words.iterator(chunk_size=CHUNK_SIZE):
+            yield {
+                "word": word.word,
+                "level": word.level,
+                "definitions": [
+                    {
+                        "definition": definition.definition,
+                        "part_of_speech": definition.part_of_speech,
+                        "example": definition.example,
+                        "translation": definition.translation,
+                    }
+                    for definition in word.definition_set.all()
+                ],
+                "test_type": word.test_type,
+            }
+
+    @staticmethod
+    def iter_problems():
+        problems = Problem.objects.order_by("hashed_id").values(
+            "field", "problem", "options", "answer", "correct_rate", "word_id")
+
+        for problem in problems.iterator(chunk_size=CHUNK_SIZE):
+            problem["word"] = problem.pop("word_id")
+            if problem["word"] is None:
+                problem.pop("word")
+            yield problem
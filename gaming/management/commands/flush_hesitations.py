@@ -0,0 +1,37 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import DatabaseError, close_old_connections
+from redis import RedisError
+
+from gaming.hesitation import FLUSH_INTERVAL, flush_hesitations
+
+
+class Command(BaseCommand):
+    help = "Write the buffered hesitations and update the average hesitation of their words"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--interval", type=float, default=FLUSH_INTERVAL,
+                            help="the seconds between two flushes")
+        parser.add_argument("--once", action="store_true",
+                            help="flush the buffered hesitations once and exit")
+
+    def handle(self, *args, **options):
+        if options["once"]:
+            self.stdout.write(self.style.SUCCESS(f"wrote {flush_hesitations()} hesitations"))
+            return
+
+        self.stdout.write(f"flushing the hesitations every {options['interval']}s")
+        while True:
+            # the flusher runs unsupervised, the hesitations of a failed flush are put back into the buffer
+            try:
+                written = flush_hesitations()
+            except (DatabaseError, RedisError) as e:
+                self.stderr.write(self.style.ERROR(f"failed to flush the hesitations: {e!r}"))
+                # reconnect on the next flush if the connection is broken
+                close_old_connections()
+            else:
+                if written:
+                    self.stdout.write(f"wrote {written} hesitations")
+
+            time.sleep(options["interval"])
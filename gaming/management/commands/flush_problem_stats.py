@@ -0,0 +1,37 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import DatabaseError, close_old_connections
+from redis import RedisError
+
+from gaming.problem_stats import FLUSH_INTERVAL, flush
+
+
+class Command(BaseCommand):
+    help = "Flush the buffered answer counters of the problems and update their correct rates"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--interval", type=float, default=FLUSH_INTERVAL,
+                            help="the seconds between two flushes")
+        parser.add_argument("--once", action="store_true",
+                            help="flush the buffered counters once and exit")
+
+    def handle(self, *args, **options):
+        if options["once"]:
+            self.stdout.write(self.style.SUCCESS(f"updated {flush()} problems"))
+            return
+
+        self.stdout.write(f"flushing the problem stats every {options['interval']}s")
+        while True:
+            # the flusher runs unsupervised, an outage only delays the flush, the counters are kept buffered
+            try:
+                updated = flush()
+            except (DatabaseError, RedisError) as e:
+                self.stderr.write(self.style.ERROR(f"failed to flush the problem stats: {e!r}"))
+                # reconnect on the next flush if the connection is broken
+                close_old_connections()
+            else:
+                if updated:
+                    self.stdout.write(f"updated {updated} problems")
+
+            time.sleep(options["interval"])
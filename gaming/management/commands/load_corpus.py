@@ -0,0 +1,30 @@
+from django.core.management.base import BaseCommand
+
+from gaming.corpus import iter_words, iter_problems
+from gaming.loaders import BATCH_SIZE, load_words, load_problems
+
+
+class Command(BaseCommand):
+    help = "Bulk load the word and problem corpus from JSON or JSON Lines (.jsonl) files"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--words", default="gaming/words.json",
+                            help="path to the word list, empty to skip")
+        parser.add_argument("--problems", default="gaming/problems.json",
+                            help="path to the problems of every field, empty to skip")
+        parser.add_argument("--batch-size", type=int, default=BATCH_SIZE)
+
+    def handle(self, *args, **options):
+        if options["words"]:
+            stats = load_words(iter_words(options["words"]), batch_size=options["batch_size"])
+            self.report("words", stats)
+
+        if options["problems"]:
+            stats = load_problems(iter_problems(options["problems"]), batch_size=options["batch_size"])
+            self.report("problems", stats)
+
+    def report(self, name, stats):
+        counts = ", ".join(
+            f"{k} {v}" for k, v in stats.items() if k not in ("seconds", "rows_per_sec"))
+        self.stdout.write(self.style.SUCCESS(
+            f"loaded {name}: {counts} in {stats['seconds']:.2f} s ({stats['rows_per_sec']:.0f} rows/sec)"))
@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand
+
+from gaming.models import User
+from gaming.review import rebuild_reviews
+
+
+class Command(BaseCommand):
+    help = "Rebuild the spaced repetition schedules from the word learning history"
+
+    def add_arguments(self, parser):
+        parser.add_argument("usernames", nargs="*",
+                            help="the users to rebuild, every user if not specified")
+
+    def handle(self, *args, **options):
+        users = None
+        if options["usernames"]:
+            users = User.objects.filter(username__in=options["usernames"])
+
+        count = rebuild_reviews(users)
+        self.stdout.write(self.style.SUCCESS(f"rebuilt {count} word review schedules"))
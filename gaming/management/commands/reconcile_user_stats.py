@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand
+
+from gaming.models import User
+from gaming.stats import reconcile_user_stats, replay_ratings
+
+
+class Command(BaseCommand):
+    help = "Recompute the battle counters, the stats and the ratings of the users from their history"
+
+    def add_arguments(self, parser):
+        parser.add_argument("usernames", nargs="*",
+                            help="the users to reconcile, every user if not specified")
+
+    def handle(self, *args, **options):
+        users = None
+        if options["usernames"]:
+            users = User.objects.filter(username__in=options["usernames"])
+
+        count = reconcile_user_stats(users)
+        self.stdout.write(self.style.SUCCESS(f"reconciled {count} users"))
+
+        # the ratings depend on the whole history, so they are only replayed for every user
+        if users is None:
+            self.stdout.write(self.style.SUCCESS(f"replayed the ratings of {replay_ratings()} users"))
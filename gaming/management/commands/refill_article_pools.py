@@ -0,0 +1,33 @@
+import asyncio
+
+from django.core.management.base import BaseCommand
+
+from gaming.articles import articlePool
+from gaming.models import Word
+
+
+class Command(BaseCommand):
+    help = "Keep the pools of the pre-generated articles full, set ARTICLE_MODEL=stub to use the local model"
+
+    def add_arguments(self, parser):
+        parser.add_argument("levels", nargs="*", type=int,
+                            help="the levels to refill, every level of the words if not specified")
+        parser.add_argument("--interval", type=float, default=30,
+                            help="the seconds between two checks of the pools")
+        parser.add_argument("--once", action="store_true",
+                            help="refill the pools once and exit")
+
+    def handle(self, *args, **options):
+        levels = options["levels"] or sorted(set(Word.objects.values_list("level", flat=True)))
+
+        if options["once"]:
+            async def refill_all():
+                return await asyncio.gather(*[articlePool.refill(level) for level in levels])
+
+            counts = asyncio.run(refill_all())
+            self.stdout.write(self.style.SUCCESS(
+                f"generated {sum(count or 0 for count in counts)} articles for {len(levels)} levels"))
+            return
+
+        self.stdout.write(f"refilling the article pools of the levels {levels} every {options['interval']}s")
+        asyncio.run(articlePool.refill_forever(levels, options["interval"]))
@@ -0,0 +1,28 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from gaming.consumers import matchMaker
+
+
+class Command(BaseCommand):
+    help = "Compact the matchmaking waiting queues, dropping the rooms of the cancelled and lost hosts"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--interval", type=float, default=60,
+                            help="the seconds between two sweeps")
+        parser.add_argument("--once", action="store_true",
+                            help="sweep the waiting queues once and exit")
+
+    def handle(self, *args, **options):
+        if options["once"]:
+            self.stdout.write(self.style.SUCCESS(f"dropped {matchMaker.sweep()} rooms"))
+            return
+
+        self.stdout.write(f"sweeping the waiting queues every {options['interval']}s")
+        while True:
+            removed = matchMaker.sweep()
+            if removed:
+                self.stdout.write(f"dropped {removed} rooms")
+
+            time.sleep(options["interval"])
@@ -0,0 +1,277 @@
+import hashlib
+
+import redis
+import redis.asyncio
+
+ROOM_PREFIX = "room"
+ROOM_HOST_POSTFIX = "host"
+# the set of the waiting queue keys, walked by the sweeper
+WAITING_QUEUES_KEY = "waiting_queues"
+
+# the host key of a waiting room expires unless the host refreshes it with a heartbeat, so the rooms of
+# the crashed workers are skipped
+HOST_TTL = 30
+HEARTBEAT_INTERVAL = 10
+# the cancel marker only has to outlive the host key, a room without a host key is skipped anyway
+CANCEL_TTL = HOST_TTL
+
+HOST = "host"
+GUEST = "guest"
+EMPTY = "empty"
+
+JOIN = "join"
+REMATCH = "rematch"
+
+# KEYS[1]: the waiting queue of the challenge, e.g. `gre_0_queue`
+# KEYS[2]: the set of the waiting queues
+# ARGV[1]: the room name of the player, registered if the player becomes the host
+# ARGV[2]: the postfix of the host key, the host key is `{roomName}_{postfix}`
+# ARGV[3]: the username of the player
+# ARGV[4]: "1" if the player is allowed to host a room, otherwise "0"
+# ARGV[5]: the TTL of the host key and of the waiting queue
+# ARGV[6]: the rating of the player
+# ARGV[7], ARGV[8]: the lowest and the highest rating of the hosts to match, or "-inf" and "+inf"
+# ARGV[9]: "join" for a player entering the queue, or "rematch" for a waiting host looking for a match
+# with a wider window, which also refreshes its room
+JOIN_SCRIPT = """
+local queue_key = KEYS[1]
+local queues_key = KEYS[2]
+local room = ARGV[1]
+local host_postfix = ARGV[2]
+local username = ARGV[3]
+local can_host = ARGV[4]
+local host_ttl = tonumber(ARGV[5])
+local rating = tonumber(ARGV[6])
+local min_rating = ARGV[7]
+local max_rating = ARGV[8]
+local mode = ARGV[9]
+
+local host_key = room .. '_' .. host_postfix
+
+-- the room of a rematching host has been matched, cancelled or has expired
+if mode == 'rematch' and redis.call('EXISTS', host_key) == 0 then
+    redis.call('ZREM', queue_key, room)
+    return {'empty'}
+end
+
+-- the room of the player is left out of the search
+redis.call('ZREM', queue_key, room)
+
+-- match the host of the nearest rating in the window, each lookup is O(log n)
+while true do
+    local above = redis.call('ZRANGEBYSCORE', queue_key, rating, max_rating, 'WITHSCORES', 'LIMIT', 0, 1)
+    local below = redis.call('ZREVRANGEBYSCORE', queue_key, rating, min_rating, 'WITHSCORES', 'LIMIT', 0, 1)
+    if #above == 0 and #below == 0 then
+        break
+    end
+
+    local candidate = above[1]
+    if #above == 0 or (#below > 0 and rating - tonumber(below[2]) < tonumber(above[2]) - rating) then
+        candidate = below[1]
+    end
+
+    -- the room is cancelled if its cancel marker exists, and its host is gone if its host key has expired,
+    -- drop the room and move on
+    redis.call('ZREM', queue_key, candidate)
+    local cancelled = redis.call('DEL', candidate) == 1
+    local candidate_host_key = candidate .. '_' .. host_postfix
+    local host = redis.call('GET', candidate_host_key)
+    if host and not cancelled then
+        redis.call('DEL', candidate_host_key, host_key)
+        return {'guest', candidate, host}
+    end
+end
+
+if mode == 'rematch' then
+    redis.call('ZADD', queue_key, rating, room)
+    redis.call('EXPIRE', host_key, host_ttl)
+    redis.call('EXPIRE', queue_key, host_ttl)
+    return {'host', room, username}
+end
+
+if can_host ~= '1' then
+    return {'empty'}
+end
+
+-- drop the cancel marker left by a previous room of the player
+redis.call('DEL', room)
+redis.call('ZADD', queue_key, rating, room)
+redis.call('EXPIRE', queue_key, host_ttl)
+redis.call('SADD', queues_key, queue_key)
+redis.call('SET', host_key, username, 'EX', host_ttl)
+return {'host', room, username}
+"""
+
+# KEYS[1]: the waiting queue to compact
+# KEYS[2]: the set of the waiting queues
+# ARGV[1]: the postfix of the host key
+SWEEP_SCRIPT = """
+local queue_key = KEYS[1]
+local queues_key = KEYS[2]
+local host_postfix = ARGV[1]
+
+local removed = 0
+for _, room in ipairs(redis.call('ZRANGE', queue_key, 0, -1)) do
+    local cancelled = redis.call('DEL', room) == 1
+    if cancelled or redis.call('EXISTS', room .. '_' .. host_postfix) == 0 then
+        redis.call('ZREM', queue_key, room)
+        redis.call('DEL', room .. '_' .. host_postfix)
+        removed = removed + 1
+    end
+end
+
+if redis.call('EXISTS', queue_key) == 0 then
+    redis.call('SREM', queues_key, queue_key)
+end
+return removed
+"""
+
+
+class MatchMaker:
+    """
+    Pair players waiting for the same challenge by rating, within a single redis round trip.
+
+    The waiting queue of a challenge is a redis sorted set of room names scored by the rating of their
+    host. A player entering the queue is matched with the live host of the nearest rating within the
+    rating window, or hosts a new room if there is none. The whole search-skip-register sequence runs as a
+    server-side lua script, so two guests can never pop the same host, and a join costs O(log n) in the
+    number of the waiting players besides the dead rooms it drops on the way.
+
+    The window of a waiting host widens with its wait: the host calls `rematch` with its widened window
+    on every heartbeat, which either matches it as the guest of the room of another waiting player, or
+    keeps its room alive for another `host_ttl` seconds. The rooms of the hosts lost with a crashed
+    worker are skipped once their host key expires, and the rooms left in the queues by the cancelled and
+    lost hosts are dropped by `sweep`.
+
+    ========================\n
+    ### Redis layout
+    - `{challenge}_{level}_queue`: sorted set of the room names waiting for a guest scored by the rating
+    of their host, expires `HOST_TTL` seconds after the last heartbeat of its hosts
+    - `{roomName}_host`: the username of the host of the room, expires `HOST_TTL` seconds after the last
+    heartbeat of the host
+    - `{roomName}`: the cancel marker, set for `CANCEL_TTL` seconds when the host leaves before being matched
+    - `waiting_queues`: set of the waiting queue keys, for the sweeper
+    """
+
+    def __init__(self, client: redis.Redis | redis.asyncio.Redis, host_ttl=HOST_TTL):
+        self.client = client
+        self.host_ttl = host_ttl
+        self._join = client.register_script(JOIN_SCRIPT)
+        self._sweep = client.register_script(SWEEP_SCRIPT)
+
+    @staticmethod
+    def room_name(username: str, waiting_key: str) -> str:
+        # a stable digest, the room name of a player is computed by the workers of both players, and is
+        # a valid channel group name whatever the username is
+        return f"{ROOM_PREFIX}_{hashlib.sha1(username.encode()).hexdigest()}_{waiting_key}"
+
+    @staticmethod
+    def host_key(room_name: str) -> str:
+        return f"{room_name}_{ROOM_HOST_POSTFIX}"
+
+    def join(self, waiting_key: str, username: str, rating: float, window=None, can_host: bool = True):
+        """
+        Match the player with the live host of the nearest rating within `window` of the rating of the
+        player, any rating if the window is None, or register the player as the host of a new room if no
+        such host is waiting.
+
+        Return a tuple of `(role, roomName, hostUsername)`, where role is one of
+        - `HOST`: the player is registered as the host of `roomName`
+        - `GUEST`: the player is matched with `hostUsername` in `roomName`
+        - `EMPTY`: no live host is waiting and the player is not allowed to host
+        """
+        result = self._join(**self._join_params(JOIN, waiting_key, username, rating, window, can_host))
+        return self._parse(result)
+
+    def rematch(self, waiting_key: str, username: str, rating: float, window=None):
+        """
+        Look for a match for a waiting host with its widened window, and keep its room alive for another
+        `host_ttl` seconds if there is none.
+
+        Return a tuple of `(role, roomName, hostUsername)` like `join`, where the role is
+        - `HOST`: the host is still waiting in its room
+        - `GUEST`: the host has left its room to join `roomName` of `hostUsername`
+        - `EMPTY`: the room is no longer waiting, i.e. it has been matched, cancelled or has expired
+        """
+        return self._parse(self._join(**self._join_params(REMATCH, waiting_key, username, rating, window)))
+
+    def cancel(self, room_name: str):
+        """
+        Mark the room as cancelled so that the guests would skip it, and remove its host key.
+        """
+        pipe = self.client.pipeline(transaction=True)
+        pipe.set(room_name, 1, ex=CANCEL_TTL)
+        pipe.delete(self.host_key(room_name))
+        pipe.execute()
+
+    def sweep(self):
+        """
+        Compact every waiting queue, dropping the rooms of the cancelled and lost hosts.
+        Return the number of the dropped rooms.
+        """
+        return sum(
+            self._sweep(**self._sweep_params(waiting_key))
+            for waiting_key in self.client.smembers(WAITING_QUEUES_KEY)
+        )
+
+    def _join_params(self, mode, waiting_key: str, username: str, rating: float, window, can_host=True):
+        return {
+            "keys": [waiting_key, WAITING_QUEUES_KEY],
+            "args": [
+                self.room_name(username, waiting_key),
+                ROOM_HOST_POSTFIX,
+                username,
+                "1" if can_host else "0",
+                self.host_ttl,
+                rating,
+                "-inf" if window is None else rating - window,
+                "+inf" if window is None else rating + window,
+                mode,
+            ],
+        }
+
+    def _sweep_params(self, waiting_key: str):
+        return {
+            "keys": [waiting_key, WAITING_QUEUES_KEY],
+            "args": [ROOM_HOST_POSTFIX],
+        }
+
+    def _parse(self, result):
+        role, *rest = result
+
+        role = self._decode(role)
+        if role == EMPTY:
+            return EMPTY, None, None
+
+        room_name, host_username = (self._decode(v) for v in rest)
+        return role, room_name, host_username
+
+    @staticmethod
+    def _decode(value):
+        return value if isinstance(value, str) else value.decode()
+
+
+class AsyncMatchMaker(MatchMaker):
+    """
+    The `MatchMaker` for `redis.asyncio` clients, used by the async game consumer.
+    """
+
+    async def join(self, waiting_key: str, username: str, rating: float, window=None, can_host: bool = True):
+        result = await self._join(**self._join_params(JOIN, waiting_key, username, rating, window, can_host))
+        return self._parse(result)
+
+    async def rematch(self, waiting_key: str, username: str, rating: float, window=None):
+        result = await self._join(**self._join_params(REMATCH, waiting_key, username, rating, window))
+        return self._parse(result)
+
+    async def cancel(self, room_name: str):
+        async with self.client.pipeline(transaction=True) as pipe:
+            pipe.set(room_name, 1, ex=CANCEL_TTL)
+            pipe.delete(self.host_key(room_name))
+            await pipe.execute()
+
+    async def sweep(self):
+        removed = 0
+        for waiting_key in await self.client.smembers(WAITING_QUEUES_KEY):
+            removed += await self._sweep(**self._sweep_params(waiting_key))
+        return removed
@@ -0,0 +1,30 @@
+# Generated by Django 5.0.4 on 2026-10-17 17:20
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('gaming', '0009_word_test_type_alter_definition_definition'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UserStats',
+            fields=[
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='stats', serialize=False, to=settings.AUTH_USER_MODEL)),
+                ('answer_count', models.IntegerField(default=0)),
+                ('correct_count', models.IntegerField(default=0)),
+                ('win_count', models.IntegerField(default=0)),
+                ('lose_count', models.IntegerField(default=0)),
+                ('word_record_count', models.IntegerField(default=0)),
+                ('first_word_date', models.DateField(blank=True, null=True)),
+            ],
+            options={
+                'db_table': 'user_stats',
+            },
+        ),
+    ]
@@ -0,0 +1,61 @@
+# Generated by Django 5.0.4 on 2026-10-17 17:21
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, Q
+from django.db.models.functions import TruncDate
+
+
+def backfill_daily_stats(apps, schema_editor):
+    # a frozen copy of `gaming.stats.backfill_daily_stats`
+    DailyStats = apps.get_model('gaming', 'DailyStats')
+    UniqueAnswerRecord = apps.get_model('gaming', 'UniqueAnswerRecord')
+    WordLearningRecord = apps.get_model('gaming', 'WordLearningRecord')
+
+    daily = {}
+
+    for row in UniqueAnswerRecord.objects.annotate(date=TruncDate('createdTime')).values(
+            'user_id', 'date').annotate(
+            answer_count=Count('id'), correct_count=Count('id', filter=Q(correct=True))):
+        key = (row['user_id'], row['date'])
+        daily.setdefault(key, DailyStats(user_id=key[0], date=key[1]))
+        daily[key].answer_count = row['answer_count']
+        daily[key].correct_count = row['correct_count']
+
+    for row in WordLearningRecord.objects.values('user_id', 'created_time').annotate(
+            word_record_count=Count('id')):
+        key = (row['user_id'], row['created_time'])
+        daily.setdefault(key, DailyStats(user_id=key[0], date=key[1]))
+        daily[key].word_record_count = row['word_record_count']
+
+    DailyStats.objects.bulk_create(list(daily.values()), batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('gaming', '0010_userstats'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailyStats',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('answer_count', models.IntegerField(default=0)),
+                ('correct_count', models.IntegerField(default=0)),
+                ('word_record_count', models.IntegerField(default=0)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_stats', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'db_table': 'daily_stats',
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='dailystats',
+            constraint=models.UniqueConstraint(fields=('user', 'date'), name='unique_daily_stats'),
+        ),
+        migrations.RunPython(backfill_daily_stats, migrations.RunPython.noop),
+    ]
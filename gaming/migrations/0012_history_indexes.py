@@ -0,0 +1,37 @@
+# Generated by Django 5.0.4 on 2026-10-17 17:22
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('gaming', '0011_dailystats'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='hesitation',
+            index=models.Index(fields=['user', 'word'], name='hesitation_user_word_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='problem',
+            index=models.Index(fields=['field'], name='problem_field_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='uniqueanswerrecord',
+            index=models.Index(fields=['user', 'createdTime'], include=('correct',), name='answer_user_time_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='word',
+            index=models.Index(fields=['test_type', 'level'], name='word_type_level_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='wordlearningrecord',
+            index=models.Index(fields=['user', 'word'], include=('status',), name='word_record_user_word_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='wordlearningrecord',
+            index=models.Index(fields=['user', 'created_time'], name='word_record_user_time_idx'),
+        ),
+    ]
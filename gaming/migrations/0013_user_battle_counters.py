@@ -0,0 +1,48 @@
+# Generated by Django 5.0.4 on 2026-10-17 17:23
+
+from django.db import migrations, models
+from django.db.models import F, Func, OuterRef, Q, Subquery
+
+
+def count_battles(apps, schema_editor):
+    User = apps.get_model('gaming', 'User')
+    BattleRecord = apps.get_model('gaming', 'BattleRecord')
+
+    def count(queryset):
+        return Subquery(queryset.order_by().annotate(
+            count=Func(F('id'), function='COUNT')).values('count'))
+
+    wins = count(BattleRecord.objects.filter(winner=OuterRef('pk')))
+    battles = count(BattleRecord.objects.filter(
+        Q(winner=OuterRef('pk')) | Q(loser=OuterRef('pk'))))
+
+    User.objects.update(win_count=wins, lose_count=battles - wins)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('gaming', '0012_history_indexes'),
+    ]
+
+    operations = [
+        migrations.RemoveField(
+            model_name='userstats',
+            name='lose_count',
+        ),
+        migrations.RemoveField(
+            model_name='userstats',
+            name='win_count',
+        ),
+        migrations.AddField(
+            model_name='user',
+            name='lose_count',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='user',
+            name='win_count',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.RunPython(count_battles, migrations.RunPython.noop),
+    ]
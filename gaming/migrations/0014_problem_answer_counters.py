@@ -0,0 +1,48 @@
+# Generated by Django 5.0.4 on 2026-10-17 17:25
+
+from django.db import migrations, models
+from django.db.models import F, FloatField, Func, OuterRef, Subquery
+from django.db.models.functions import Cast
+
+
+# frozen copies of `gaming.problem_stats.PRIOR_RATE` and `PRIOR_ATTEMPTS`
+PRIOR_RATE = 60.0
+PRIOR_ATTEMPTS = 10
+
+
+def count_answers(apps, schema_editor):
+    Problem = apps.get_model('gaming', 'Problem')
+    UniqueAnswerRecord = apps.get_model('gaming', 'UniqueAnswerRecord')
+
+    def count(queryset):
+        return Subquery(queryset.order_by().annotate(
+            count=Func(F('id'), function='COUNT')).values('count'))
+
+    Problem.objects.update(
+        attempt_count=count(UniqueAnswerRecord.objects.filter(problem=OuterRef('pk'))),
+        correct_count=count(UniqueAnswerRecord.objects.filter(problem=OuterRef('pk'), correct=True)),
+    )
+    Problem.objects.filter(attempt_count__gt=0).update(
+        correct_rate=(Cast(F('correct_count'), FloatField()) * 100 + PRIOR_RATE * PRIOR_ATTEMPTS)
+        / (F('attempt_count') + PRIOR_ATTEMPTS))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('gaming', '0013_user_battle_counters'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='problem',
+            name='attempt_count',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='problem',
+            name='correct_count',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.RunPython(count_answers, migrations.RunPython.noop),
+    ]
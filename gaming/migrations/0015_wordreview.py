@@ -0,0 +1,35 @@
+# Generated by Django 5.0.4 on 2026-10-17 17:30
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('gaming', '0014_problem_answer_counters'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='WordReview',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('repetitions', models.IntegerField(default=0)),
+                ('interval', models.IntegerField(default=0)),
+                ('ease_factor', models.FloatField(default=2.5)),
+                ('due_time', models.DateTimeField()),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='word_reviews', to=settings.AUTH_USER_MODEL)),
+                ('word', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='gaming.word')),
+            ],
+            options={
+                'db_table': 'word_review',
+                'indexes': [models.Index(fields=['user', 'due_time'], name='word_review_user_due_idx')],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='wordreview',
+            constraint=models.UniqueConstraint(fields=('user', 'word'), name='unique_word_review'),
+        ),
+    ]
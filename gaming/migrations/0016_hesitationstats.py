@@ -0,0 +1,38 @@
+# Generated by Django 5.0.4 on 2026-10-17 17:31
+
+import datetime
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count, Sum
+
+
+def sum_hesitations(apps, schema_editor):
+    Hesitation = apps.get_model('gaming', 'Hesitation')
+    HesitationStats = apps.get_model('gaming', 'HesitationStats')
+
+    HesitationStats.objects.bulk_create([
+        HesitationStats(word_id=row['word'], hesitation_count=row['count'], total_duration=row['total'])
+        for row in Hesitation.objects.values('word').annotate(count=Count('id'), total=Sum('duration'))
+    ], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('gaming', '0015_wordreview'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='HesitationStats',
+            fields=[
+                ('word', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='hesitation_stats', serialize=False, to='gaming.word')),
+                ('hesitation_count', models.IntegerField(default=0)),
+                ('total_duration', models.DurationField(default=datetime.timedelta)),
+            ],
+            options={
+                'db_table': 'hesitation_stats',
+            },
+        ),
+        migrations.RunPython(sum_hesitations, migrations.RunPython.noop),
+    ]
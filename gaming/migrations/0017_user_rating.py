@@ -0,0 +1,52 @@
+# Generated by Django 5.0.4 on 2026-10-17 21:40
+
+from django.db import migrations, models
+
+INITIAL_RATING = 1500.0
+
+
+def elo(winner_rating, loser_rating, winner_battles, loser_battles):
+    expected = 1 / (1 + 10 ** ((loser_rating - winner_rating) / 400))
+    winner_k = 48 if winner_battles < 20 else 24
+    loser_k = 48 if loser_battles < 20 else 24
+    return winner_rating + winner_k * (1 - expected), loser_rating - loser_k * (1 - expected)
+
+
+def replay_ratings(apps, schema_editor):
+    User = apps.get_model('gaming', 'User')
+    BattleRecord = apps.get_model('gaming', 'BattleRecord')
+
+    ratings = {}
+    battle_counts = {}
+    for winner, loser in BattleRecord.objects.filter(
+            winner__isnull=False, loser__isnull=False).order_by('id').values_list('winner', 'loser'):
+        if winner == loser:
+            continue
+
+        ratings[winner], ratings[loser] = elo(
+            ratings.get(winner, INITIAL_RATING), ratings.get(loser, INITIAL_RATING),
+            battle_counts.get(winner, 0), battle_counts.get(loser, 0),
+        )
+        battle_counts[winner] = battle_counts.get(winner, 0) + 1
+        battle_counts[loser] = battle_counts.get(loser, 0) + 1
+
+    users = User.objects.filter(pk__in=ratings.keys())
+    for user in users:
+        user.rating = ratings[user.pk]
+    User.objects.bulk_update(users, ['rating'], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('gaming', '0016_hesitationstats'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='user',
+            name='rating',
+            field=models.FloatField(default=1500.0),
+        ),
+        migrations.RunPython(replay_ratings, migrations.RunPython.noop),
+    ]
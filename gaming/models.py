@@ -1,8 +1,12 @@
+from datetime import timedelta
+
 from django.db import models
 from django.contrib.auth.models import AbstractBaseUser, BaseUserManager, PermissionsMixin
 from django.utils import timezone
 from uuid import uuid4
 
+from .algo import INITIAL_RATING
+
 NURSING = "Nursing"
 SANRIO = "Sanrio"
 HIGHSCHOOL = "highschool"
@@ -71,6 +75,12 @@ class User(AbstractBaseUser, PermissionsMixin):
     date_joined = models.DateTimeField(default=timezone.now)
     last_login = models.DateTimeField(blank=True, null=True)
 
+    # denormalised battle counters, see `gaming.stats.record_battle`
+    win_count = models.IntegerField(default=0)
+    lose_count = models.IntegerField(default=0)
+    # the Elo rating of the battles, see `gaming.stats.update_ratings`
+    rating = models.FloatField(default=INITIAL_RATING)
+
     objects = CustomUserManager()
 
     USERNAME_FIELD = 'username'
@@ -96,6 +106,11 @@ class AnswerRecord(models.Model):
 class UniqueAnswerRecord(models.Model):
     class Meta:
         db_table = "unique_answer_record"
+        indexes = [
+            # the answer history of a user in a time range, covering the correctness
+            models.Index(fields=['user', 'createdTime'], include=['correct'],
+                         name='answer_user_time_idx'),
+        ]
 
     user = models.ForeignKey(User, on_delete=models.CASCADE)
     problem = models.ForeignKey(
@@ -118,6 +133,9 @@ class BattleRecord(models.Model):
 class Problem(models.Model):
     class Meta:
         db_table = "problem"
+        indexes = [
+            models.Index(fields=['field'], name='problem_field_idx'),
+        ]
 
     hashed_id = models.CharField(max_length=256, primary_key=True, unique=True)
     word = models.ForeignKey('Word', on_delete=models.SET_NULL, null=True)
@@ -126,11 +144,18 @@ class Problem(models.Model):
     answer = models.IntegerField()
     options = models.JSONField()
     correct_rate = models.FloatField(default=60.0)
+    # running answer counters, see `gaming.problem_stats`
+    attempt_count = models.IntegerField(default=0)
+    correct_count = models.IntegerField(default=0)
 
 
 class Word(models.Model):
     class Meta:
         db_table = "word"
+        indexes = [
+            # the words of a level
+            models.Index(fields=['test_type', 'level'], name='word_type_level_idx'),
+        ]
 
     word = models.CharField(primary_key=True, max_length=256, unique=True)
     level = models.IntegerField()
@@ -159,6 +184,12 @@ class Definition(models.Model):
 class WordLearningRecord(models.Model):
     class Meta:
         db_table = "word_learning_record"
+        indexes = [
+            # the learning status of the words of a user, covering the status
+            models.Index(fields=['user', 'word'], include=['status'],
+                         name='word_record_user_word_idx'),
+            models.Index(fields=['user', 'created_time'], name='word_record_user_time_idx'),
+        ]
 
     word = models.ForeignKey('Word', on_delete=models.CASCADE)
     user = models.ForeignKey('User', on_delete=models.CASCADE)
@@ -169,8 +200,89 @@ class WordLearningRecord(models.Model):
 class Hesitation(models.Model):
     class Meta:
         db_table = "hesitation"
+        indexes = [
+            models.Index(fields=['user', 'word'], name='hesitation_user_word_idx'),
+        ]
 
     word = models.ForeignKey('Word', on_delete=models.CASCADE)
     user = models.ForeignKey('User', on_delete=models.CASCADE)
     duration = models.DurationField()
     created_time = models.DateTimeField(auto_now_add=True)
+
+
+class UserStats(models.Model):
+    """
+    The counters behind the profile stats of a user, maintained incrementally as the records are written.
+    See `gaming.stats` for the maintenance.
+    """
+    class Meta:
+        db_table = "user_stats"
+
+    user = models.OneToOneField(
+        'User', related_name="stats", on_delete=models.CASCADE, primary_key=True)
+    answer_count = models.IntegerField(default=0)
+    correct_count = models.IntegerField(default=0)
+    word_record_count = models.IntegerField(default=0)
+    first_word_date = models.DateField(null=True, blank=True)
+
+
+class DailyStats(models.Model):
+    """
+    The daily rollup of the records of a user, maintained incrementally as the records are written.
+    See `gaming.stats` for the maintenance.
+    """
+    class Meta:
+        db_table = "daily_stats"
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'date'], name='unique_daily_stats'),
+        ]
+
+    user = models.ForeignKey('User', related_name="daily_stats", on_delete=models.CASCADE)
+    date = models.DateField()
+    answer_count = models.IntegerField(default=0)
+    correct_count = models.IntegerField(default=0)
+    word_record_count = models.IntegerField(default=0)
+
+
+class WordReview(models.Model):
+    """
+    The spaced repetition schedule of a word for a user, updated by every learning record of the word.
+    See `gaming.review` for the scheduling.
+    """
+    class Meta:
+        db_table = "word_review"
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'word'], name='unique_word_review'),
+        ]
+        indexes = [
+            # the due queue of a user
+            models.Index(fields=['user', 'due_time'], name='word_review_user_due_idx'),
+        ]
+
+    user = models.ForeignKey('User', related_name="word_reviews", on_delete=models.CASCADE)
+    word = models.ForeignKey('Word', on_delete=models.CASCADE)
+    repetitions = models.IntegerField(default=0)
+    interval = models.IntegerField(default=0)
+    ease_factor = models.FloatField(default=2.5)
+    due_time = models.DateTimeField()
+
+
+class HesitationStats(models.Model):
+    """
+    The running total of the hesitations on a word, maintained incrementally as the hesitations are flushed.
+    See `gaming.hesitation` for the maintenance.
+    """
+    class Meta:
+        db_table = "hesitation_stats"
+
+    word = models.OneToOneField(
+        'Word', related_name="hesitation_stats", on_delete=models.CASCADE, primary_key=True)
+    hesitation_count = models.IntegerField(default=0)
+    total_duration = models.DurationField(default=timedelta)
+
+    @property
+    def average_duration(self):
+        if self.hesitation_count == 0:
+            return None
+
+        return self.total_duration / self.hesitation_count
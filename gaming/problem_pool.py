@@ -0,0 +1,161 @@
+import random
+import threading
+import time
+
+from gaming.algo import ProblemBuckets, problem_difficulty
+from gaming.models import Problem, GRE
+from gaming.redis_client import r
+
+POOL_VERSION_KEY = "problem_pool_version"
+# the correct rates change with the flushed answers, so the buckets are refreshed periodically
+BUCKET_REFRESH_INTERVAL = 10 * 60
+
+
+class ProblemPool:
+    """
+    In-process pool of the battle problems per `(field, level)`.
+
+    The problems of a pool are loaded from postgres on the first draw and kept in a list, so that a battle
+    set is drawn with `random.sample` in O(k) regardless of the size of the problem table. The pools are
+    invalidated across every daphne process by bumping a version counter in redis when the problems are
+    re-initialized; a draw only costs a single redis `GET` to check the version.
+
+    Each entry of a pool is a tuple of `(hashed_id, problem, options, answer_option)`. The entries are
+    bucketed by difficulty, from the correct rate of the problem and the level of its word, to draw a set
+    matching the skill of the players. The buckets are rebuilt every `BUCKET_REFRESH_INTERVAL` seconds
+    from the correct rates only, without reloading the problems, by a single draw outside of the lock,
+    while the other draws keep drawing from the stale buckets until the new ones are swapped in.
+    """
+
+    def __init__(self, client=r):
+        self.client = client
+        self._pools = {}
+        self._version = None
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def pool_key(field, level):
+        # only the GRE problems are filtered by the word level
+        return (field, level) if field == GRE else (field, None)
+
+    def draw(self, field, level, k=5, difficulty=None):
+        """
+        Draw k random problems of the field with their options shuffled, in the format sent by `startGame`.
+        The problems are drawn around the difficulty in [0, 1] if specified, or uniformly otherwise.
+        """
+        pool = self.get_pool(field, level)
+
+        problems = []
+        for hashed_id, problem, options, answer_option in pool.sample(k, difficulty):
+            order = random.sample(range(len(options)), len(options))
+            shuffled_options = [options[i] for i in order]
+            problems.append({
+                "problem_id": hashed_id,
+                "problem": problem,
+                "options": shuffled_options,
+                "answer": shuffled_options.index(answer_option),
+                # the indices of the shuffled options in the stored ones, for the clients caching the problems
+                "order": order,
+            })
+
+        return problems
+
+    def get_pool(self, field, level):
+        self._check_version()
+
+        key = self.pool_key(field, level)
+        pool = self._pools.get(key)
+        if pool is not None and time.monotonic() - pool.built_at < BUCKET_REFRESH_INTERVAL:
+            return pool
+
+        with self._lock:
+            pool = self._pools.get(key)
+            if pool is None:
+                pool = self._pools[key] = self._load(*key)
+                return pool
+
+            if pool.refreshing or time.monotonic() - pool.built_at < BUCKET_REFRESH_INTERVAL:
+                return pool
+
+            pool.refreshing = True
+            pools = self._pools
+
+        try:
+            rebuilt = self._rebucket(pool, *key)
+        finally:
+            pool.refreshing = False
+
+        with self._lock:
+            # the pools may have been invalidated during the rebuild
+            if self._pools is pools and pools.get(key) is pool:
+                pools[key] = rebuilt
+
+        return rebuilt
+
+    def invalidate(self):
+        """
+        Drop the pools of every process, should be called after the problem table is changed.
+        """
+        self.client.incr(POOL_VERSION_KEY)
+        with self._lock:
+            self._pools = {}
+
+    def _check_version(self):
+        version = self.client.get(POOL_VERSION_KEY)
+        if version != self._version:
+            with self._lock:
+                self._pools = {}
+                self._version = version
+
+    @staticmethod
+    def _problems(field, level):
+        problems = Problem.objects.filter(field=field)
+        if level is not None:
+            problems = problems.filter(word__level__lte=(1+level) * 4)
+
+        return problems
+
+    @staticmethod
+    def _bucket(entries, rates):
+        """
+        Bucket the entries by difficulty, from `{hashed_id: (correct_rate, word_level)}`.
+        """
+        levels = [word_level for _, word_level in rates.values() if word_level is not None]
+        max_word_level = max(levels, default=None)
+
+        difficulties = []
+        for entry in entries:
+            correct_rate, word_level = rates[entry[0]]
+            difficulties.append(problem_difficulty(correct_rate, word_level, max_word_level))
+
+        pool = ProblemBuckets(entries, difficulties, key=lambda entry: entry[0])
+        pool.built_at = time.monotonic()
+        pool.refreshing = False
+        return pool
+
+    @classmethod
+    def _load(cls, field, level):
+        entries = []
+        rates = {}
+        problems = cls._problems(field, level).values_list(
+            'hashed_id', 'problem', 'options', 'answer', 'correct_rate', 'word__level')
+
+        for hashed_id, problem, options, answer, correct_rate, word_level in problems:
+            entries.append((hashed_id, problem, options, options[answer]))
+            rates[hashed_id] = (correct_rate, word_level)
+
+        return cls._bucket(entries, rates)
+
+    @classmethod
+    def _rebucket(cls, pool, field, level):
+        rates = {
+            hashed_id: (correct_rate, word_level)
+            for hashed_id, correct_rate, word_level in cls._problems(field, level).values_list(
+                'hashed_id', 'correct_rate', 'word__level')
+        }
+
+        # the problems added since the load are left for the next invalidation
+        return cls._bucket([entry for entry in pool.problems if entry[0] in rates], rates)
+
+
+problemPool = ProblemPool()
@@ -0,0 +1,96 @@
+from django.db import transaction
+from django.db.models import Case, F, FloatField, IntegerField, Value, When
+from django.db.models.functions import Cast
+
+from .models import Problem
+from .redis_client import r
+
+ATTEMPT_BUFFER_KEY = "problem_attempt_buffer"
+CORRECT_BUFFER_KEY = "problem_correct_buffer"
+# the seconds between two flushes of `flush_problem_stats`
+FLUSH_INTERVAL = 60
+FLUSH_BATCH_SIZE = 500
+
+# the correct rate of a problem starts from the default rate of the problems, as if it had been answered
+# `PRIOR_ATTEMPTS` times at that rate, so a few answers don't swing the difficulty bucket of the problem
+PRIOR_RATE = 60.0
+PRIOR_ATTEMPTS = 10
+
+
+def buffer_answers(records):
+    """
+    Buffer the answers of a battle in the redis counters of the problems, with a single round trip.
+    `records` is the list of `{"problem_id": str, "correct": bool}` posted to `Record.post`.
+    """
+    if not records:
+        return
+
+    pipe = r.pipeline(transaction=False)
+    for record in records:
+        pipe.hincrby(ATTEMPT_BUFFER_KEY, record["problem_id"], 1)
+        if record["correct"]:
+            pipe.hincrby(CORRECT_BUFFER_KEY, record["problem_id"], 1)
+    pipe.execute()
+
+
+def flush():
+    """
+    Apply the buffered counters to the problem table and update the correct rates, run periodically by the
+    `flush_problem_stats` command.
+
+    The buffers are taken atomically, so the answers buffered during the flush are left for the next one.
+    If the update fails, the taken counters are put back into the buffers.
+    Return the number of the updated problems.
+    """
+    pipe = r.pipeline(transaction=True)
+    pipe.hgetall(ATTEMPT_BUFFER_KEY)
+    pipe.hgetall(CORRECT_BUFFER_KEY)
+    pipe.delete(ATTEMPT_BUFFER_KEY, CORRECT_BUFFER_KEY)
+    attempts, corrects, _ = pipe.execute()
+
+    attempts = {problem_id: int(count) for problem_id, count in attempts.items()}
+    corrects = {problem_id: int(count) for problem_id, count in corrects.items()}
+
+    try:
+        return apply_counts(attempts, corrects)
+    except Exception:
+        pipe = r.pipeline(transaction=False)
+        for problem_id, count in attempts.items():
+            pipe.hincrby(ATTEMPT_BUFFER_KEY, problem_id, count)
+        for problem_id, count in corrects.items():
+            pipe.hincrby(CORRECT_BUFFER_KEY, problem_id, count)
+        pipe.execute()
+        raise
+
+
+def apply_counts(attempts, corrects):
+    """
+    Add the counts to the counters of the problems, with one `UPDATE` per batch of problems.
+    The correct rate is smoothed toward `PRIOR_RATE` by `PRIOR_ATTEMPTS` virtual attempts.
+    """
+    problem_ids = list(attempts.keys())
+    updated = 0
+
+    with transaction.atomic():
+        for i in range(0, len(problem_ids), FLUSH_BATCH_SIZE):
+            batch = problem_ids[i:i + FLUSH_BATCH_SIZE]
+
+            added_attempts = Case(
+                *[When(pk=problem_id, then=Value(attempts[problem_id])) for problem_id in batch],
+                default=Value(0), output_field=IntegerField(),
+            )
+            added_corrects = Case(
+                *[When(pk=problem_id, then=Value(corrects.get(problem_id, 0))) for problem_id in batch],
+                default=Value(0), output_field=IntegerField(),
+            )
+
+            # the right hand sides are evaluated against the counters before the update
+            updated += Problem.objects.filter(pk__in=batch).update(
+                attempt_count=F('attempt_count') + added_attempts,
+                correct_count=F('correct_count') + added_corrects,
+                correct_rate=(Cast(F('correct_count') + added_corrects, FloatField()) * 100
+                              + PRIOR_RATE * PRIOR_ATTEMPTS)
+                / (F('attempt_count') + added_attempts + PRIOR_ATTEMPTS),
+            )
+
+    return updated
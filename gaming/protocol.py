@@ -0,0 +1,134 @@
+import json
+
+import msgpack
+
+JSON = "json"
+MSGPACK = "msgpack"
+
+FULL = "full"
+REF = "ref"
+
+# the type codes of the msgpack frames
+WAIT = 0
+START_GAME = 1
+ROUND_RESULT = 2
+ERROR = 3
+ANSWER = 4
+
+
+class JSONCodec:
+    """
+    The text protocol of the battle sockets, every frame is a JSON object with a `type` field.
+
+    The answers of the problems of `start_game` are kept on the server, which scores the rounds, and are
+    never sent. With `refs`, the problems are sent as `{"problem_id", "order"}`, where `order` lists the
+    indices of the shuffled options in the options of the problem bundle cached by the client, instead of
+    the problem text and the options.
+    """
+
+    def __init__(self, refs=False):
+        self.refs = refs
+
+    def encode(self, message):
+        """
+        Encode a message into the keyword arguments of `send`.
+        """
+        return {"text_data": json.dumps(self.compact(message))}
+
+    def decode(self, text_data=None, bytes_data=None):
+        return json.loads(text_data if text_data is not None else bytes_data)
+
+    def compact(self, message):
+        if message.get("type") != "start_game":
+            return message
+
+        if self.refs:
+            problems = [
+                {"problem_id": problem["problem_id"], "order": problem["order"]}
+                for problem in message["problems"]
+            ]
+        else:
+            problems = [
+                {field: value for field, value in problem.items() if field != "answer"}
+                for problem in message["problems"]
+            ]
+
+        return {**message, "problems": problems}
+
+
+class MsgpackCodec(JSONCodec):
+    """
+    The compact binary protocol of the battle sockets, every frame is a msgpack array of a type code
+    followed by the positional fields of the message:
+
+    - `[WAIT]`
+    - `[START_GAME, problems, usernames, names, round_seconds]`, where a problem is
+    `[problem_id, problem, options]`, or `[problem_id, order]` with `refs`
+    - `[ROUND_RESULT, round, finished, next_deadline, results]`, where a result is
+    `[username, option_index, correct, added_score, score]`
+    - `[ERROR, error]`
+    - `[ANSWER, option_index, round]`, sent by the clients
+
+    The JSON text frames are still accepted from the clients.
+    """
+
+    def encode(self, message):
+        return {"bytes_data": msgpack.packb(self.pack(message))}
+
+    def decode(self, text_data=None, bytes_data=None):
+        if bytes_data is None:
+            return super().decode(text_data)
+
+        frame = msgpack.unpackb(bytes_data)
+        if frame[0] != ANSWER:
+            raise ValueError(f"invalid frame type {frame[0]}")
+
+        option_index, round_index = (frame[1:] + [None, None])[:2]
+        return {"type": "answer", "optionIndex": option_index, "round": round_index}
+
+    def pack(self, message):
+        if "error" in message:
+            return [ERROR, message["error"]]
+
+        message_type = message["type"]
+        if message_type == "wait":
+            return [WAIT]
+
+        if message_type == "start_game":
+            if self.refs:
+                problems = [
+                    [problem["problem_id"], problem["order"]]
+                    for problem in message["problems"]
+                ]
+            else:
+                problems = [
+                    [problem["problem_id"], problem["problem"], problem["options"]]
+                    for problem in message["problems"]
+                ]
+
+            return [START_GAME, problems, message["usernames"], message["names"], message["round_seconds"]]
+
+        if message_type == "round_result":
+            return [ROUND_RESULT, message["round"], message["finished"], message["next_deadline"], [
+                [result["username"], result["option_index"], result["correct"], result["added_score"],
+                 result["score"]]
+                for result in message["results"]
+            ]]
+
+        raise ValueError(f"invalid message type '{message_type}'")
+
+
+def get_codec(query):
+    """
+    Get the codec negotiated by the query parameters of the socket url, `encoding` (`json` or `msgpack`)
+    and `problems` (`full` or `ref`).
+    """
+    encoding = query.get("encoding", [JSON])[0]
+    refs = query.get("problems", [FULL])[0] == REF
+
+    if encoding == MSGPACK:
+        return MsgpackCodec(refs)
+    if encoding == JSON:
+        return JSONCodec(refs)
+
+    raise ValueError(f"invalid encoding '{encoding}'")
@@ -0,0 +1,29 @@
+import os
+# redis
+import redis
+import redis.asyncio
+
+r = redis.StrictRedis(
+    host=os.environ.get('REDIS_HOST'),
+    port=os.environ.get('REDIS_PORT'),
+    decode_responses=True,
+    username=os.environ.get('REDIS_USERNAME'),
+    password=os.environ.get('REDIS_PASSWORD')
+)
+
+
+
+def new_async_client():
+    """
+    Create an async client, whose connections are bound to the event loop they are opened in.
+    """
+    return redis.asyncio.StrictRedis(
+        host=os.environ.get('REDIS_HOST'),
+        port=os.environ.get('REDIS_PORT'),
+        decode_responses=True,
+        username=os.environ.get('REDIS_USERNAME'),
+        password=os.environ.get('REDIS_PASSWORD')
+    )
+
+
+ar = new_async_client()
@@ -0,0 +1,91 @@
+from datetime import datetime, time, timedelta
+
+from django.db import IntegrityError, transaction
+from django.db.models import Prefetch
+from django.utils import timezone
+
+from .algo import sm2
+from .models import Definition, WordLearningRecord, WordReview, LEARNING, REVIEWING, MASTERED
+
+# the quality of the answer reported by each learning status
+STATUS_QUALITY = {
+    LEARNING: 2,
+    REVIEWING: 4,
+    MASTERED: 5,
+}
+
+
+def schedule(review, status, now):
+    review.repetitions, review.interval, review.ease_factor = sm2(
+        review.repetitions, review.interval, review.ease_factor, STATUS_QUALITY.get(status, 0))
+    review.due_time = now + timedelta(days=review.interval)
+
+
+def record_review(user, word, status):
+    """
+    Reschedule the review of the word after a new learning record of the user.
+    """
+    now = timezone.now()
+
+    try:
+        with transaction.atomic():
+            review = WordReview.objects.select_for_update().get(user=user, word=word)
+            schedule(review, status, now)
+            review.save(update_fields=['repetitions', 'interval', 'ease_factor', 'due_time'])
+            return review
+    except WordReview.DoesNotExist:
+        pass
+
+    review = WordReview(user=user, word=word)
+    schedule(review, status, now)
+
+    try:
+        with transaction.atomic():
+            review.save()
+    except IntegrityError:
+        # created by a concurrent request
+        return record_review(user, word, status)
+
+    return review
+
+
+def get_due_reviews(user, count, now=None):
+    """
+    Get the next `count` reviews of the user due by now, the most overdue first, with the words and their
+    first definition. The due queue is read from the `(user, due_time)` index.
+    """
+    now = now or timezone.now()
+
+    return list(
+        WordReview.objects.filter(user=user, due_time__lte=now).order_by('due_time')
+        .select_related('word').prefetch_related(
+            Prefetch('word__definition_set', queryset=Definition.objects.order_by('id'), to_attr='definitions'),
+        )[:count]
+    )
+
+
+def rebuild_reviews(users=None):
+    """
+    Rebuild the review schedules by replaying the learning history of the users, or of every user if not
+    specified. The history only keeps the dates, so a record is taken at the start of its day.
+    Return the number of the schedules written.
+    """
+    records = WordLearningRecord.objects.all()
+    schedules = WordReview.objects.all()
+    if users is not None:
+        records = records.filter(user__in=users)
+        schedules = schedules.filter(user__in=users)
+
+    reviews = {}
+    for user_id, word_id, status, created_time in records.order_by('id').values_list(
+            'user_id', 'word_id', 'status', 'created_time').iterator():
+        key = (user_id, word_id)
+        review = reviews.setdefault(key, WordReview(user_id=user_id, word_id=word_id))
+
+        schedule(review, status, timezone.make_aware(datetime.combine(created_time, time.min)))
+
+    with transaction.atomic():
+        schedules.delete()
+        WordReview.objects.bulk_create(list(reviews.values()), batch_size=1000)
+
+    return len(reviews)
@@ -2,5 +2,6 @@ from django.urls import re_path, path
 from . import consumers
 
 websocket_urlpatterns = [
+    re_path(r'battle_async', consumers.AsyncGameConsumer.as_asgi()),
     re_path(r'battle', consumers.GameConsumer.as_asgi()),
 ]
@@ -0,0 +1,52 @@
+import random
+import threading
+
+from .redis_client import r
+
+
+class IdSampler:
+    """
+    In-process arrays of the primary keys of the rows per key, to draw k random rows in O(k).
+
+    `order_by('?')` sorts every row of the filter to take the first k, so its cost grows with the table.
+    Here the primary keys of a key are loaded once with a single `values_list` and kept in a list, and a
+    draw is a `random.sample` of the list. The arrays are invalidated across every process by a version
+    counter in redis, like the battle problem pools, so a draw only costs a single redis `GET`.
+
+    `queryset` maps a key to the queryset of its rows, e.g. `lambda level: Word.objects.filter(level=level)`.
+    """
+
+    def __init__(self, queryset, version_key, client=r):
+        self.queryset = queryset
+        self.version_key = version_key
+        self.client = client
+        self._ids = {}
+        self._version = None
+        self._lock = threading.Lock()
+
+    def sample(self, key, k):
+        """
+        Draw the primary keys of k distinct random rows of the key, or of every row if there are fewer.
+        """
+        ids = self.get_ids(key)
+        return random.sample(ids, min(k, len(ids)))
+
+    def get_ids(self, key):
+        self._check_version()
+
+        ids = self._ids.get(key)
+        if ids is not None:
+            return ids
+
+        with self._lock:
+            if key not in self._ids:
+                self._ids[key] = list(self.queryset(key).values_list('pk', flat=True))
+
+            return self._ids[key]
+
+    def _check_version(self):
+        version = self.client.get(self.version_key)
+        if version != self._version:
+            with self._lock:
+                self._ids = {}
+                self._version = version
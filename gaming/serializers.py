@@ -1,7 +1,6 @@
 from rest_framework import serializers
 from django.contrib.auth import authenticate
 from django.contrib.auth.hashers import make_password
-from django.db.models import QuerySet
 
 from .models import User
 
@@ -42,9 +41,10 @@ class UserSerializer(serializers.ModelSerializer):
         model = User
     
     def to_representation(self, user: User):
-        win_record: QuerySet = user.win_record.all()
-        lose_record: QuerySet = user.lose_record.all()
-        win_rate = win_record.count() / (win_record.count() + lose_record.count()) if win_record.count() + lose_record.count() > 0 else 0.0
+        # the battle counters are denormalised on the user, see `gaming.stats.record_battle`
+        win_count = user.win_count
+        lose_count = user.lose_count
+        win_rate = win_count / (win_count + lose_count) if win_count + lose_count > 0 else 0.0
 
         user_repr_dict = {
             "id": user.id,
@@ -53,8 +53,8 @@ class UserSerializer(serializers.ModelSerializer):
             "email": user.email,
             "name": user.name,
             "photo_url": "",
-            "win_record": win_record.count(),
-            "lose_record": lose_record.count(),
+            "win_record": win_count,
+            "lose_record": lose_count,
             "win_rate": win_rate
         }
 
@@ -0,0 +1,247 @@
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, Func, Min, OuterRef, Q, Subquery, Value
+from django.db.models.functions import Coalesce, TruncDate
+from django.utils import timezone
+
+from .algo import INITIAL_RATING, elo, elo_k
+from .models import User, UniqueAnswerRecord, BattleRecord, WordLearningRecord, UserStats, DailyStats
+
+
+def compute_user_stats(user):
+    """
+    Compute the stats counters of the user from the full history, with one aggregation query per table.
+    """
+    answers = UniqueAnswerRecord.objects.filter(user=user).aggregate(
+        answer_count=Count('id'),
+        correct_count=Count('id', filter=Q(correct=True)),
+    )
+
+    words = WordLearningRecord.objects.filter(user=user).aggregate(
+        word_record_count=Count('id'),
+        first_word_date=Min('created_time'),
+    )
+
+    return {
+        **answers,
+        **words,
+    }
+
+
+def reconcile_user_stats(users=None):
+    """
+    Recompute the battle counters of the users from the battle records, and drop their stats rows to be
+    recomputed from the history on the next access. Reconcile every user if the users are not specified.
+    Return the number of the reconciled users.
+    """
+    def count(queryset):
+        return Subquery(queryset.order_by().annotate(
+            count=Func(F('id'), function='COUNT')).values('count'))
+
+    wins = count(BattleRecord.objects.filter(winner=OuterRef('pk')))
+    battles = count(BattleRecord.objects.filter(
+        Q(winner=OuterRef('pk')) | Q(loser=OuterRef('pk'))))
+
+    targets = User.objects.all()
+    stats = UserStats.objects.all()
+    if users is not None:
+        targets = targets.filter(pk__in=[user.pk for user in users])
+        stats = stats.filter(user__in=users)
+
+    with transaction.atomic():
+        stats.delete()
+        return targets.update(win_count=wins, lose_count=battles - wins)
+
+
+def get_user_stats(user) -> UserStats:
+    """
+    Get the maintained stats row of the user, which is computed from the history on the first access.
+    """
+    try:
+        return UserStats.objects.get(user=user)
+    except UserStats.DoesNotExist:
+        pass
+
+    # the history is computed with the user locked, so a record written meanwhile is either committed before
+    # and computed, or counted by its writer once the row is created, see `update_user_stats`
+    with transaction.atomic():
+        lock_user(user)
+
+        stats = UserStats.objects.filter(user=user).first()
+        if stats is None:
+            stats = UserStats.objects.create(user=user, **compute_user_stats(user))
+
+        return stats
+
+
+def lock_user(user):
+    """
+    Lock the row of the user until the end of the transaction.
+    """
+    list(User.objects.select_for_update().filter(pk=user.pk).values_list('pk', flat=True))
+
+
+def update_user_stats(user, **increments):
+    """
+    Apply the F-expression increments to the stats row of the user, e.g. for the new records of the user.
+    Should be called in the transaction writing the records.
+
+    A missing row is either computed from the history later, with the records, or being computed by a
+    concurrent `get_user_stats`, so the update is retried once the user lock is taken, after its creation.
+    """
+    stats = UserStats.objects.filter(user=user)
+    if stats.update(**increments):
+        return
+
+    lock_user(user)
+    stats.update(**increments)
+
+
+def record_answers(user, answer_count, correct_count):
+    """
+    Count the new answer records of the user. Should be called in the transaction writing the records.
+    """
+    update_user_stats(
+        user,
+        answer_count=F('answer_count') + answer_count,
+        correct_count=F('correct_count') + correct_count,
+    )
+
+    record_daily(user, answer_count=answer_count, correct_count=correct_count)
+
+
+def record_battle(winner, loser):
+    """
+    Count the new battle record on the denormalised counters of the players, and update their ratings.
+    Should be called in the transaction writing the battle record.
+    """
+    if loser is None or loser == winner:
+        User.objects.filter(pk=winner.pk).update(win_count=F('win_count') + 1)
+        return
+
+    winner_rating, loser_rating = update_ratings(winner, loser)
+    User.objects.filter(pk=winner.pk).update(win_count=F('win_count') + 1, rating=winner_rating)
+    User.objects.filter(pk=loser.pk).update(lose_count=F('lose_count') + 1, rating=loser_rating)
+
+
+def update_ratings(winner, loser):
+    """
+    Compute the Elo ratings of the players after the battle, with their rows locked until the end of the
+    transaction so the concurrent battles of a player are rated one after the other.
+    """
+    players = {
+        user.pk: user for user in User.objects.select_for_update().filter(
+            pk__in=[winner.pk, loser.pk]).order_by('pk').only('rating', 'win_count', 'lose_count')
+    }
+    winner, loser = players[winner.pk], players[loser.pk]
+
+    return elo(
+        winner.rating, loser.rating,
+        elo_k(winner.win_count + winner.lose_count), elo_k(loser.win_count + loser.lose_count),
+    )
+
+
+def replay_ratings():
+    """
+    Recompute the ratings of every user by replaying the battle records in order.
+    Return the number of the rated users.
+    """
+    ratings = {}
+    battle_counts = {}
+    records = BattleRecord.objects.filter(
+        winner__isnull=False, loser__isnull=False).order_by('id').values_list('winner', 'loser')
+
+    for winner, loser in records.iterator():
+        if winner == loser:
+            continue
+
+        ratings[winner], ratings[loser] = elo(
+            ratings.get(winner, INITIAL_RATING), ratings.get(loser, INITIAL_RATING),
+            elo_k(battle_counts.get(winner, 0)), elo_k(battle_counts.get(loser, 0)),
+        )
+        battle_counts[winner] = battle_counts.get(winner, 0) + 1
+        battle_counts[loser] = battle_counts.get(loser, 0) + 1
+
+    with transaction.atomic():
+        User.objects.exclude(pk__in=ratings.keys()).update(rating=INITIAL_RATING)
+
+        users = list(User.objects.filter(pk__in=ratings.keys()).only('pk'))
+        for user in users:
+            user.rating = ratings[user.pk]
+        User.objects.bulk_update(users, ['rating'], batch_size=1000)
+
+    return len(users)
+
+
+def record_word(user):
+    """
+    Count the new word record of the user. Should be called in the transaction writing the record.
+    """
+    update_user_stats(
+        user,
+        word_record_count=F('word_record_count') + 1,
+        first_word_date=Coalesce('first_word_date', Value(timezone.localdate())),
+    )
+
+    record_daily(user, word_record_count=1)
+
+
+def record_daily(user, **counts):
+    """
+    Add the counts to the daily rollup of the user for today, e.g. `record_daily(user, answer_count=5)`.
+    """
+    today = timezone.localdate()
+    increments = {field: F(field) + count for field, count in counts.items()}
+
+    if DailyStats.objects.filter(user=user, date=today).update(**increments):
+        return
+
+    try:
+        with transaction.atomic():
+            DailyStats.objects.create(user=user, date=today, **counts)
+    except IntegrityError:
+        # created by a concurrent request
+        DailyStats.objects.filter(user=user, date=today).update(**increments)
+
+
+def get_daily_stats(user, start, end):
+    """
+    Get `{date: DailyStats}` of the user between the start and the end date, both included.
+    """
+    return {
+        daily.date: daily
+        for daily in DailyStats.objects.filter(user=user, date__range=(start, end))
+    }
+
+
+def backfill_daily_stats(users=None):
+    """
+    Rebuild the daily rollups from the history of the users, or of every user if not specified.
+    Return the number of the rollup rows written.
+    """
+    answers = UniqueAnswerRecord.objects.all()
+    words = WordLearningRecord.objects.all()
+    rollups = DailyStats.objects.all()
+    if users is not None:
+        answers = answers.filter(user__in=users)
+        words = words.filter(user__in=users)
+        rollups = rollups.filter(user__in=users)
+
+    daily = {}
+
+    for row in answers.annotate(date=TruncDate('createdTime')).values('user_id', 'date').annotate(
+            answer_count=Count('id'), correct_count=Count('id', filter=Q(correct=True))):
+        key = (row['user_id'], row['date'])
+        daily.setdefault(key, DailyStats(user_id=key[0], date=key[1]))
+        daily[key].answer_count = row['answer_count']
+        daily[key].correct_count = row['correct_count']
+
+    for row in words.values('user_id', 'created_time').annotate(word_record_count=Count('id')):
+        key = (row['user_id'], row['created_time'])
+        daily.setdefault(key, DailyStats(user_id=key[0], date=key[1]))
+        daily[key].word_record_count = row['word_record_count']
+
+    with transaction.atomic():
+        rollups.delete()
+        DailyStats.objects.bulk_create(list(daily.values()), batch_size=1000)
+
+    return len(daily)
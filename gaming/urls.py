@@ -13,7 +13,11 @@ urlpatterns = [
     path('correct_rate', CorrectRateAPI.as_view()),
     path('word_progress', WordProgressAPI.as_view()),
     path('word', WordAPI.as_view()),
+    path('review', ReviewAPI.as_view()),
+    path('hesitation', HesitationAPI.as_view()),
+    path('bundle', ProblemBundleAPI.as_view()),
     path('article', CreateArticle.as_view()),
+    path('article_pool_metrics', ArticlePoolMetrics.as_view()),
     path('initialize_problem', InitializeProblem.as_view()),
     path('initialize_word', InitializeWord.as_view()),
 ]
@@ -1,26 +1,38 @@
-from .algo import hash_problem
+from .corpus import iter_words, iter_problems
+from .loaders import load_words, load_problems
+from .word_list import get_word_list, get_word_levels
+from .bundle import problemBundles, negotiate_encoding, IDENTITY
+from .review import get_due_reviews, record_review
+from .problem_stats import buffer_answers
+from .articles import articleGenerator, articlePool, pick_article_words
+from .hesitation import buffer_hesitations, get_hesitation_stats
+from .stats import get_user_stats, get_daily_stats, record_answers, record_battle, record_word
 from .serializers import UserSignupSerializer, UserSigninSerializer, UserSerializer
 from .models import *
 import os
-import json
 from datetime import datetime, timedelta
 
 from django.shortcuts import render
+from django.db import transaction
 from django.db.models import QuerySet
+from django.utils import timezone
+from django.utils.http import parse_etags, quote_etag
 from rest_framework.permissions import IsAuthenticated
-from django.http import HttpResponse
+from django.http import HttpResponse, JsonResponse
+from django.views import View
 from django.views.decorators.csrf import csrf_exempt
 from django.contrib.auth import authenticate
 from django.core.validators import validate_email
 from rest_framework_simplejwt.tokens import RefreshToken
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import InvalidToken
+from rest_framework.exceptions import AuthenticationFailed
+from asgiref.sync import sync_to_async
 
 from rest_framework.views import APIView, Response, Request, status
 
 from google.oauth2 import id_token
 from google.auth.transport import requests
-import google.generativeai as genai
-
-genai.configure(api_key=os.environ["GEMINI_API_KEY"])
 
 
 class AuthGoogle(APIView):
@@ -479,13 +491,12 @@ class Record(APIView):
         """
 
         user = request.user
+        user_stats = get_user_stats(user)
         stats = []
 
         # correct rate
-        correct = UniqueAnswerRecord.objects.filter(
-            user=user, correct=True).count()
-        total = UniqueAnswerRecord.objects.filter(
-            user=user).count()
+        correct = user_stats.correct_count
+        total = user_stats.answer_count
         correct_rate = correct / total if total > 0 else 0
 
         stats.append(
@@ -497,10 +508,8 @@ class Record(APIView):
         )
 
         # win rate
-        win = BattleRecord.objects.filter(
-            winner=user).count()
-        total = BattleRecord.objects.filter(
-            models.Q(winner=user) | models.Q(loser=user)).count()
+        win = user.win_count
+        total = user.win_count + user.lose_count
         win_rate = win / total if total > 0 else 0
 
         stats.append(
@@ -513,17 +522,13 @@ class Record(APIView):
 
         # avg words
         avg_words = 0
-        first_word = WordLearningRecord.objects.filter(
-            user=user).order_by('created_time').first()
-
-        if first_word:
-            first_word_date = first_word.created_time
+        first_word_date = user_stats.first_word_date
 
+        if first_word_date:
             today = datetime.now().date()
             days = (today - first_word_date).days + 1
 
-            avg_words = WordLearningRecord.objects.filter(
-                user=user).count() / days if days > 0 else 0
+            avg_words = user_stats.word_record_count / days if days > 0 else 0
 
         stats.append(
             {
@@ -542,23 +547,44 @@ class Record(APIView):
 
         field = request.data["field"]
         records = request.data["records"]
-        for record in records:
-            problem = Problem.objects.get(hashed_id=record["problem_id"])
-            correct = record["correct"]
 
-            # update the answer record
-            UniqueAnswerRecord.objects.create(
-                user=request.user,
-                problem=problem,
-                correct=correct,
-            )
+        # resolve every problem with a single query
+        problem_ids = {record["problem_id"] for record in records}
+        problems = Problem.objects.in_bulk(problem_ids)
+        if len(problems) < len(problem_ids):
+            return Response({"error": "problem not found"}, status=status.HTTP_404_NOT_FOUND)
 
-        # update the battle record
+        opponent = None
         if request.data["victory"]:
             opponent = User.objects.filter(
                 username=request.data["opponent"]).first()
-            BattleRecord.objects.create(
-                winner=request.user, loser=opponent, field=request.data["field"])
+
+        with transaction.atomic():
+            # update the answer record
+            UniqueAnswerRecord.objects.bulk_create([
+                UniqueAnswerRecord(
+                    user=request.user,
+                    problem=problems[record["problem_id"]],
+                    correct=record["correct"],
+                )
+                for record in records
+            ])
+
+            record_answers(
+                request.user,
+                answer_count=len(records),
+                correct_count=sum(1 for record in records if record["correct"]),
+            )
+
+            # update the battle record
+            if request.data["victory"]:
+                BattleRecord.objects.create(
+                    winner=request.user, loser=opponent, field=field)
+                record_battle(request.user, opponent)
+
+        # the correct rates of the problems are updated in batch from the buffered answers, by the
+        # `flush_problem_stats` command
+        buffer_answers(records)
 
         return Response({"message": "updated"}, status=status.HTTP_200_OK)
 
@@ -610,24 +636,7 @@ class WordAPI(APIView):
 
         level = request.GET.get("level")
         test_type = request.GET.get("test_type", "gre")
-        words = Word.objects.filter(level=level, test_type=test_type)
-
-        serialized_words = [
-            {
-                "word": word.word,
-                "definition": Definition.objects.filter(word=word).first().definition,
-                "translation": Definition.objects.filter(word=word).first().translation,
-                "partOfSpeech": Definition.objects.filter(word=word).first().part_of_speech,
-                "example": Definition.objects.filter(word=word).first().example,
-                "level": word.level,
-                "testType": word.test_type,
-                "isLearned": WordLearningRecord.objects.filter(
-                    user=request.user, word=word).first().status == REVIEWING if len(WordLearningRecord.objects.filter(
-                        user=request.user, word=word)) > 0 else False,
-                "seenCount": WordLearningRecord.objects.filter(
-                    user=request.user, word=word).count(),
-            } for word in words
-        ]
+        serialized_words = get_word_list(request.user, level, test_type)
 
         return Response(serialized_words, status=status.HTTP_200_OK)
 
@@ -646,12 +655,241 @@ class WordAPI(APIView):
 
         learning_status = request.data["status"]
 
-        WordLearningRecord.objects.create(
-            user=request.user, word=word_object, status=learning_status)
+        with transaction.atomic():
+            WordLearningRecord.objects.create(
+                user=request.user, word=word_object, status=learning_status)
+            record_word(request.user)
+        record_review(request.user, word_object, learning_status)
 
         return Response({"message": "updated"}, status=status.HTTP_200_OK)
 
 
+class ReviewAPI(APIView):
+    """
+    Get the words due for review, scheduled by spaced repetition from the word records.
+
+    GET /review/
+    ------------
+    Request Headers: Authorization header with Bearer token.
+    Request Params:
+    {
+        "count": "integer, 20 by default"
+    }
+
+    Response:
+    - Success (200 OK):
+    [
+        {
+            "word": "string",
+            "definition": "string",
+            "translation": "string",
+            "partOfSpeech": "string",
+            "example": "string",
+            "level": "integer",
+            "testType": "string",
+            "dueTime": "datetime",
+            "interval": "integer, in days",
+            "repetitions": "integer"
+        }
+    ]
+    """
+    permission_classes = [IsAuthenticated]
+    MAX_COUNT = 100
+
+    def get(self, request):
+        try:
+            count = int(request.GET.get("count", 20))
+        except ValueError:
+            return Response({"error": "count should be an integer"}, status=status.HTTP_400_BAD_REQUEST)
+
+        count = min(max(count, 0), self.MAX_COUNT)
+
+        serialized_words = []
+        for review in get_due_reviews(request.user, count):
+            word = review.word
+            definition = word.definitions[0] if word.definitions else None
+
+            serialized_words.append({
+                "word": word.word,
+                "definition": definition.definition if definition else None,
+                "translation": definition.translation if definition else None,
+                "partOfSpeech": definition.part_of_speech if definition else None,
+                "example": definition.example if definition else None,
+                "level": word.level,
+                "testType": word.test_type,
+                "dueTime": review.due_time,
+                "interval": review.interval,
+                "repetitions": review.repetitions,
+            })
+
+        return Response(serialized_words, status=status.HTTP_200_OK)
+
+
+class HesitationAPI(APIView):
+    """
+    Record the hesitations of the user on the words, and get the average hesitation of the words.
+
+    GET /hesitation/
+    ----------------
+    Request Headers: Authorization header with Bearer token.
+    Request Params:
+    {
+        "word": "string, repeated for every word"
+    }
+
+    Response:
+    - Success (200 OK):
+    [
+        {
+            "word": "string",
+            "count": "integer",
+            "averageDuration": "float, in milliseconds"
+        }
+    ]
+
+    POST /hesitation/
+    -----------------
+    Request Headers: Authorization header with Bearer token.
+    Request Body:
+    {
+        "hesitations": [
+            {
+                "word": "string",
+                "duration": "float, in milliseconds"
+            }
+        ]
+    }
+
+    Response:
+    - Accepted (202 Accepted), the hesitations are buffered and written by the `flush_hesitations` command:
+    {
+        "message": "recorded"
+    }
+    """
+    permission_classes = [IsAuthenticated]
+    MAX_HESITATIONS = 1000
+    # in milliseconds
+    MAX_DURATION = 60 * 60 * 1000
+
+    def get(self, request):
+        words = request.GET.getlist("word")
+        hesitation_stats = get_hesitation_stats(words)
+
+        serialized_words = []
+        for word in words:
+            stats = hesitation_stats.get(word)
+            average_duration = stats.average_duration if stats else None
+
+            serialized_words.append({
+                "word": word,
+                "count": stats.hesitation_count if stats else 0,
+                "averageDuration": average_duration / timedelta(milliseconds=1)
+                if average_duration is not None else None,
+            })
+
+        return Response(serialized_words, status=status.HTTP_200_OK)
+
+    def post(self, request):
+        hesitations = request.data.get("hesitations")
+
+        if not isinstance(hesitations, list) or len(hesitations) > self.MAX_HESITATIONS:
+            return Response(
+                {"error": f"hesitations should be a list of at most {self.MAX_HESITATIONS} events"},
+                status=status.HTTP_400_BAD_REQUEST)
+
+        for hesitation in hesitations:
+            if not isinstance(hesitation, dict) \
+                    or not isinstance(hesitation.get("word"), str) \
+                    or isinstance(hesitation.get("duration"), bool) \
+                    or not isinstance(hesitation.get("duration"), (int, float)) \
+                    or not 0 <= hesitation["duration"] <= self.MAX_DURATION:
+                return Response(
+                    {"error": f"a hesitation should have a word and a duration between 0 and "
+                              f"{self.MAX_DURATION} milliseconds"},
+                    status=status.HTTP_400_BAD_REQUEST)
+
+        # the hesitations are written in batch from the buffer, by the `flush_hesitations` command
+        buffer_hesitations(request.user, hesitations)
+
+        return Response({"message": "recorded"}, status=status.HTTP_202_ACCEPTED)
+
+
+class ProblemBundleAPI(APIView):
+    """
+    Download the problems of a field and the words they refer to, for the clients caching the corpus and
+    resolving the problems referred by id in the battle frames.
+
+    The bundle is compressed by the `Accept-Encoding` of the request (brotli or gzip), and its ETag only
+    depends on its content. A client holding a bundle sends its ETag in `If-None-Match` to get a
+    304 Not Modified, and in `since` to get only the changes from its bundle when it is outdated. The full
+    bundle is returned with a null `base` if the bundle `since` is unknown.
+
+    GET /bundle/
+    ------------
+    Request Headers: Authorization header with Bearer token, `If-None-Match` and `Accept-Encoding`.
+    Request Params:
+    {
+        "field": "string",
+        "since": "string, the ETag of the bundle held by the client"
+    }
+
+    Response:
+    - Success (200 OK):
+    {
+        "field": "string",
+        "etag": "string",
+        "base": "string, the ETag the delta applies to, or null for the full bundle",
+        "problems": [
+            {
+                "problem_id": "string",
+                "problem": "string",
+                "options": ["string"],
+                "word": "string"
+            }
+        ],
+        "words": [
+            {
+                "word": "string",
+                "definition": "string",
+                "translation": "string",
+                "partOfSpeech": "string",
+                "example": "string",
+                "level": "integer",
+                "testType": "string"
+            }
+        ],
+        "removedProblems": ["string"],
+        "removedWords": ["string"]
+    }
+    - Not Modified (304)
+    """
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request):
+        field = request.GET.get("field")
+        if not field:
+            return Response({"error": "field is required"}, status=status.HTTP_400_BAD_REQUEST)
+
+        bundle = problemBundles.get_bundle(field)
+        etag = quote_etag(bundle.etag)
+
+        if etag in parse_etags(request.headers.get("If-None-Match", "")):
+            response = HttpResponse(status=status.HTTP_304_NOT_MODIFIED)
+        else:
+            encoding = negotiate_encoding(request.headers.get("Accept-Encoding"))
+            bundle, body = problemBundles.render(field, encoding, request.GET.get("since"))
+
+            response = HttpResponse(body, content_type="application/json")
+            if encoding != IDENTITY:
+                response["Content-Encoding"] = encoding
+
+        response["ETag"] = etag
+        response["Vary"] = "Accept-Encoding"
+        # the clients revalidate their bundle with the ETag
+        response["Cache-Control"] = "private, no-cache"
+        return response
+
+
 class WordProgressAPI(APIView):
     """
     Get the user word progress
@@ -680,18 +918,15 @@ class WordProgressAPI(APIView):
         """
         word_progress = []
 
-        today = datetime.today()
+        today = timezone.localdate()
         start_of_month = today.replace(day=1)
 
+        daily_stats = get_daily_stats(request.user, start_of_month, today)
+
         current_date = start_of_month
         while current_date <= today:
-            # Perform actions for each day here
-
-            word_learning_record = WordLearningRecord.objects.filter(
-                user=request.user, created_time=current_date.date()
-            ).count()
-
-            word_progress.append(word_learning_record)
+            daily = daily_stats.get(current_date)
+            word_progress.append(daily.word_record_count if daily else 0)
 
             current_date += timedelta(days=1)
 
@@ -717,24 +952,19 @@ class CorrectRateAPI(APIView):
         """
         correct_rate = []
 
-        today = datetime.today()
+        today = timezone.localdate()
         start_date = today - timedelta(days=6)
 
+        daily_stats = get_daily_stats(
+            request.user, start_date, today + timedelta(days=1))
+
         current_date = start_date
         while current_date <= today:
-            # Perform actions for each day here
             current_date += timedelta(days=1)
 
-            correct_answers = UniqueAnswerRecord.objects.filter(
-                user=request.user, createdTime__date=current_date.date(), correct=True
-            ).count()
-
-            total_answers = UniqueAnswerRecord.objects.filter(
-                user=request.user, createdTime__date=current_date.date()
-            ).count()
-
-            if total_answers > 0:
-                daily_correct_rate = (correct_answers / total_answers) * 100
+            daily = daily_stats.get(current_date)
+            if daily and daily.answer_count > 0:
+                daily_correct_rate = (daily.correct_count / daily.answer_count) * 100
             else:
                 daily_correct_rate = 0
 
@@ -743,10 +973,34 @@ class CorrectRateAPI(APIView):
         return Response([correct_rate], status=status.HTTP_200_OK)
 
 
-class CreateArticle(APIView):
+async def authenticate_jwt(request):
+    """
+    Authenticate the bearer token of the request like the DRF views do, for the async views.
+    """
+    try:
+        result = await sync_to_async(JWTAuthentication().authenticate)(request)
+    except (InvalidToken, AuthenticationFailed):
+        return None
+
+    return result[0] if result else None
+
+
+def is_admin(user):
+    """
+    Whether the user is the admin named by the `ADMIN_USERNAME` environment variable, nobody if it is unset.
+    """
+    admin_username = os.environ.get("ADMIN_USERNAME")
+    return user is not None and admin_username is not None and user.username == admin_username
+
+
+class CreateArticle(View):
     """
     Create an article from specified words
 
+    The article is taken from the pool of the pre-generated articles of the level, which is refilled in the
+    background. If the pool is empty, the article is generated on the event loop without occupying a worker,
+    and shared by the requests for the same words, see `gaming.articles`.
+
     GET /create_article/
     -----------------------
     Request Headers: Authorization header with Bearer token.
@@ -760,48 +1014,66 @@ class CreateArticle(APIView):
     {
         "article": "string"
     }
+    - Failure (404 Not Found):
+    {
+        "error": "level not found"
+    }
     """
-    permission_classes = [IsAuthenticated]
 
-    GEMINI_API_KEY = os.environ["GEMINI_API_KEY"]
-
-    # Create the model
-    _query_generation_model = genai.GenerativeModel(
-        model_name="gemini-2.0-flash-exp",
-        generation_config={
-            "temperature": 0.8,
-            "top_p": 0.95,
-            "top_k": 40,
-            "max_output_tokens": 8192,
-            "response_mime_type": "text/plain",
-        },
-    )
+    async def get(self, request):
+        user = await authenticate_jwt(request)
+        if user is None:
+            return JsonResponse({"detail": "Authentication credentials were not provided."},
+                                status=status.HTTP_401_UNAUTHORIZED)
 
-    chat_history = []
+        try:
+            level = int(request.GET.get("level"))
+        except (TypeError, ValueError):
+            return JsonResponse({"error": "level should be an integer"}, status=status.HTTP_400_BAD_REQUEST)
 
-    @classmethod
-    def _send_message(cls, model: genai.GenerativeModel, message: str) -> str:
-        chat_session = model.start_chat(history=[])
+        # the pools and the sampled words are kept per level, so only the levels of the words are accepted
+        if level not in await sync_to_async(get_word_levels)():
+            return JsonResponse({"error": "level not found"}, status=status.HTTP_404_NOT_FOUND)
 
-        response = chat_session.send_message(message)
-        return response.text
+        article = await articlePool.take(level)
+        if article is None:
+            article = await articleGenerator.generate(level, await pick_article_words(level), foreground=True)
 
-    def get(self, request):
-        level = int(request.GET.get("level"))
-        words = Word.objects.filter(level=level).order_by('?')[:10]
+        return JsonResponse({"article": article}, status=status.HTTP_200_OK)
+
+
+class ArticlePoolMetrics(View):
+    """
+    Get the metrics of the pre-generated article pools
 
-        prompt = f"""
-make me a article with 300 words that must include the following words: {words}. 
-The article doesn't have to be great, but must include the the words mentioned. 
-The response should be in plain text format that only contain the article without any other words, and the included words in the article should be marked with @word&
-"""
-        print(prompt)
+    GET /article_pool_metrics/
+    --------------------------
+    Request Headers: Authorization header with Bearer token.
 
-        response = self._send_message(self._query_generation_model, prompt)
+    Response:
+    - Success (200 OK):
+    {
+        "level": {
+            "size": "integer",
+            "hits": "integer",
+            "misses": "integer",
+            "hitRate": "float",
+            "refills": "integer",
+            "averageRefillSeconds": "float"
+        }
+    }
+    - Failure (403 Forbidden):
+    {
+        "error": "no permission"
+    }
+    """
 
-        print(response)
+    async def get(self, request):
+        user = await authenticate_jwt(request)
+        if not is_admin(user):
+            return JsonResponse({"error": "no permission"}, status=status.HTTP_403_FORBIDDEN)
 
-        return Response({"article": response}, status=status.HTTP_200_OK)
+        return JsonResponse(await articlePool.get_metrics(), status=status.HTTP_200_OK)
 
 
 class InitializeProblem(APIView):
@@ -826,58 +1098,16 @@ class InitializeProblem(APIView):
 
     def post(self, request):
 
-        with open("gaming/words.json", "r") as f:
-            word_list = json.load(f)
-
-        for word in word_list:
-            word_object, created = Word.objects.get_or_create(
-                word=word["word"],
-                defaults={
-                    "word": word["word"],
-                    "level": word["level"],
-                }
-            )
-
-            for definition in word["definitions"]:
-                Definition.objects.get_or_create(
-                    word=word_object,
-                    definition=definition["definition"],
-                    part_of_speech=definition["part_of_speech"],
-                    example=definition["example"],
-                    translation=definition["translation"],
-                )
+        print(load_words(iter_words("gaming/words.json")))
 
         user = request.user
-        if user.username != os.environ["ADMIN_USERNAME"]:
+        if not is_admin(user):
             return Response({"error": "no permission"}, status=status.HTTP_403_FORBIDDEN)
 
         Problem.objects.all().delete()  # TODO: remove this after testing
 
         # initialize problems
-        with open('gaming/problems.json', 'r') as f:
-            all_problems = json.load(f)
-
-            for key, item in all_problems.items():
-                for problem in item:
-                    hashed_id = hash_problem(problem)
-
-                    print(f"word is {problem.get('word', None)}")
-
-                    problem_object, created = Problem.objects.get_or_create(
-                        hashed_id=hashed_id,
-                        defaults={
-                            "field": key,
-                            "problem": problem["problem"],
-                            "options": problem["options"],
-                            "answer": problem["answer"],
-                            "correct_rate": problem.get("correct_rate", 60.0),
-                            "word": Word.objects.get(word=problem.get("word", None)) if problem.get("word", None) else None,
-                        }
-                    )
-
-                    if created:
-                        print(
-                            f"problem {problem['problem']} is initialized")
+        print(load_problems(iter_problems("gaming/problems.json")))
 
         return Response({"message": "initialized"}, status=status.HTTP_200_OK)
     
@@ -891,37 +1121,6 @@ class InitializeWord(APIView):
         """
         Initialize words from a JSON file.
         """
-        with open("gaming/words.json", "r") as f:
-            word_list = json.load(f)
-
-        for word in word_list:
-            word_object, created = Word.objects.get_or_create(
-                word=word["word"],
-                defaults={
-                    "word": word["word"],
-                    "level": word["level"],
-                    "test_type": word["test_type"],
-                }
-            )
-
-            if not created:
-                word_object.level = word["level"]
-                word_object.save()
-
-            for definition in word["definitions"]:
-                definition_object, created = Definition.objects.get_or_create(
-                    word=word_object,
-                    definition=definition.get("definition", ""),
-                    part_of_speech=definition.get("part_of_speech", ""),
-                    example=definition.get("example", ""),
-                    translation=definition.get("translation", ""),
-                )
-
-                if not created:
-                    definition_object.definition = definition.get("definition", "")
-                    definition_object.part_of_speech = definition.get("part_of_speech", "")
-                    definition_object.example = definition.get("example", "")
-                    definition_object.translation = definition.get("translation", "")
-                    definition_object.save()
+        print(load_words(iter_words("gaming/words.json")))
 
         return Response({"message": "initialized"}, status=status.HTTP_200_OK)
@@ -0,0 +1,125 @@
+import json
+
+from django.db.models import Prefetch
+
+from .models import Word, Definition, WordLearningRecord, REVIEWING
+from .redis_client import r
+from .sampler import IdSampler
+
+CORPUS_VERSION_KEY = "word_corpus_version"
+WORD_LIST_PREFIX = "word_list"
+WORD_LEVELS_PREFIX = "word_levels"
+WORD_LIST_TTL = 60 * 60 * 24
+
+
+def get_corpus_version():
+    return r.get(CORPUS_VERSION_KEY) or "0"
+
+
+def bump_corpus_version():
+    """
+    Invalidate the cached word lists of every level, should be called after the word corpus is changed.
+    """
+    r.incr(CORPUS_VERSION_KEY)
+
+
+def get_word_levels():
+    """
+    Get the levels having words, cached in redis under the corpus version like the word lists.
+    """
+    key = f"{WORD_LEVELS_PREFIX}_{get_corpus_version()}"
+
+    cached = r.get(key)
+    if cached is not None:
+        return set(json.loads(cached))
+
+    levels = sorted(set(Word.objects.values_list('level', flat=True)))
+    r.set(key, json.dumps(levels), ex=WORD_LIST_TTL)
+
+    return set(levels)
+
+
+# random words of a level, reloaded when the corpus version is bumped
+wordSampler = IdSampler(lambda level: Word.objects.filter(level=level), CORPUS_VERSION_KEY)
+
+
+def serialize_shared_word(word):
+    """
+    Serialize a word with its first definition, prefetched in `word.definitions`.
+    """
+    definition = word.definitions[0] if word.definitions else None
+
+    return {
+        "word": word.word,
+        "definition": definition.definition if definition else None,
+        "translation": definition.translation if definition else None,
+        "partOfSpeech": definition.part_of_speech if definition else None,
+        "example": definition.example if definition else None,
+        "level": word.level,
+        "testType": word.test_type,
+    }
+
+
+def get_shared_word_list(level, test_type):
+    """
+    Get the user independent part of the word list of a level.
+
+    The serialized list is cached in redis under `(test_type, level, corpus_version)`, so a cache miss costs
+    two queries (the words and their prefetched definitions) and a hit costs none. The stale lists of the
+    previous corpus versions are left to expire.
+    """
+    key = f"{WORD_LIST_PREFIX}_{test_type}_{level}_{get_corpus_version()}"
+
+    cached = r.get(key)
+    if cached is not None:
+        return json.loads(cached)
+
+    words = Word.objects.filter(level=level, test_type=test_type).prefetch_related(
+        Prefetch('definition_set', queryset=Definition.objects.order_by('id'), to_attr='definitions'),
+    )
+
+    shared_words = [serialize_shared_word(word) for word in words]
+
+    r.set(key, json.dumps(shared_words), ex=WORD_LIST_TTL)
+
+    return shared_words
+
+
+def get_user_word_status(user, level, test_type):
+    """
+    Get `{word: (first_status, seen_count)}` of the words of a level the user has seen, in one query over
+    the learning records of the user.
+    """
+    records = WordLearningRecord.objects.filter(
+        user=user, word__level=level, word__test_type=test_type,
+    ).order_by('id').values_list('word_id', 'status')
+
+    word_status = {}
+    for word, status in records:
+        first_status, seen_count = word_status.get(word, (status, 0))
+        word_status[word] = (first_status, seen_count + 1)
+
+    return word_status
+
+
+def get_word_list(user, level, test_type):
+    """
+    Serialize the words of a level with their first definition and the learning status of the user,
+    in the format returned by `WordAPI.get`.
+
+    The cached shared list is merged with the status of the user, so the list costs a single query
+    regardless of the level size once it is cached.
+    """
+    word_status = get_user_word_status(user, level, test_type)
+
+    serialized_words = []
+    for word in get_shared_word_list(level, test_type):
+        first_status, seen_count = word_status.get(word["word"], (None, 0))
+
+        serialized_words.append({
+            **word,
+            "isLearned": first_status == REVIEWING,
+            "seenCount": seen_count,
+        })
+
+    return serialized_words
@@ -1,14 +1,22 @@
 import json
-import csv
+import os
 
-with open('gaming/words.json', 'r') as f:
-    data = json.load(f)
+from gaming.corpus import iter_words
 
-    for word in data:
-        word['test_type'] = word['type']
-        word.pop('type')
+PATH = 'gaming/words.json'
 
-        print("==============================================")
-    
-    with open('gaming/words.json', 'w') as f:
-        json.dump(data, f, indent=2, ensure_ascii=False)
+# stream the words into a new file, so only one word is kept in memory, then swap it in
+with open(PATH + '.tmp', 'w') as f:
+    f.write('[')
+
+    for i, word in enumerate(iter_words(PATH)):
+        if 'type' in word:
+            word['test_type'] = word.pop('type')
+
+        # the same layout as `json.dump(words, f, indent=2)`
+        entry = json.dumps(word, indent=2, ensure_ascii=False).replace('\n', '\n  ')
+        f.write(f'{"," if i else ""}\n  {entry}')
+
+    f.write('\n]')
+
+os.replace(PATH + '.tmp', PATH)
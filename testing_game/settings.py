@@ -13,6 +13,7 @@ https://docs.djangoproject.com/en/4.2/ref/settings/
 import os
 from datetime import timedelta
 from pathlib import Path
+from urllib.parse import quote
 from dotenv import load_dotenv
 
 load_dotenv()
@@ -131,11 +132,51 @@ TEMPLATES = [
 # WSGI_APPLICATION = "testing_game.wsgi.application"
 ASGI_APPLICATION = 'testing_game.asgi.application'
 
-CHANNEL_LAYERS = {
-    'default': {
-        'BACKEND': 'channels.layers.InMemoryChannelLayer',
-    },
-}
+# NOTE: The in-memory layer requires the two players of a room to land on the same daphne process.
+# Set CHANNEL_LAYER_BACKEND=redis to run battles across several daphne processes, the groups are
+# sharded across CHANNEL_LAYER_HOSTS (comma separated redis urls) by the consistent hash of the room name.
+CHANNEL_LAYER_BACKEND = os.environ.get('CHANNEL_LAYER_BACKEND', 'memory')
+
+
+def get_channel_layer_hosts():
+    hosts = os.environ.get('CHANNEL_LAYER_HOSTS')
+    if hosts:
+        return [host.strip() for host in hosts.split(',') if host.strip()]
+
+    # default to the redis server of the matchmaking queue, with the credentials quoted for the url
+    username = os.environ.get('REDIS_USERNAME') or ''
+    password = os.environ.get('REDIS_PASSWORD') or ''
+    auth = f"{quote(username, safe='')}:{quote(password, safe='')}@" if username or password else ""
+    return [f"redis://{auth}{os.environ.get('REDIS_HOST')}:{os.environ.get('REDIS_PORT')}"]
+
+
+if CHANNEL_LAYER_BACKEND == 'redis':
+    CHANNEL_LAYERS = {
+        'default': {
+            'BACKEND': 'channels_redis.core.RedisChannelLayer',
+            'CONFIG': {
+                'hosts': get_channel_layer_hosts(),
+                'prefix': 'battle',
+                'capacity': 1500,
+                'expiry': 10,
+            },
+        },
+    }
+else:
+    CHANNEL_LAYERS = {
+        'default': {
+            'BACKEND': 'channels.layers.InMemoryChannelLayer',
+        },
+    }
+
+# The model generating the articles, set ARTICLE_MODEL=stub to run against a local stand-in.
+# At most ARTICLE_CONCURRENCY background generations are in flight per daphne process, and apart from them
+# ARTICLE_FOREGROUND_CONCURRENCY generations of the requests waiting for an article.
+ARTICLE_MODEL = os.environ.get('ARTICLE_MODEL', 'gemini')
+ARTICLE_CONCURRENCY = int(os.environ.get('ARTICLE_CONCURRENCY', 4))
+ARTICLE_FOREGROUND_CONCURRENCY = int(os.environ.get('ARTICLE_FOREGROUND_CONCURRENCY', 4))
+# The number of the pre-generated articles kept per level, see `manage.py refill_article_pools`
+ARTICLE_POOL_SIZE = int(os.environ.get('ARTICLE_POOL_SIZE', 5))
 
 # Database
 # https://docs.djangoproject.com/en/4.2/ref/settings/#databases